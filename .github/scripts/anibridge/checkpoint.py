@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+import time
+
+
+class RunJournal:
+    """
+    Append-only JSON-lines journal of a run's progress, used to resume an interrupted run.
+
+    Events (one JSON object per line):
+
+        {"event": "started", "at": 1700000000.0}
+        {"event": "done", "ids": ["<anime id>", ...]}          # fully applied to Webflow
+        {"event": "created", "ids": ["<item id>", ...]}        # created/updated, to publish
+        {"event": "published", "ids": ["<item id>", ...]}
+
+    A run that finishes replaces its journal with only the items it could not publish (or
+    deletes it when there are none), so a journal with a "started" event found at start-up
+    belongs to a run that crashed or timed out. Every line is flushed as soon as it is written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = None
+
+    def start(self, resume_max_age=None):
+        """
+        Start a new run on top of whatever the previous unfinished run left behind.
+
+        Returns `(done, unpublished)`: the ids marked done by the previous run (only when it
+        started less than `resume_max_age` seconds ago, otherwise an empty set) and the item
+        ids it created but did not publish. Both are carried over into the new journal, so
+        they survive this run crashing too.
+        """
+        started_at, done, created, published = self._load()
+        unpublished = [item_id for item_id in dict.fromkeys(created) if item_id not in published]
+        if started_at is not None:
+            print(f"Found the journal of an unfinished run: {len(done)} done, {len(unpublished)} unpublished items")
+        elif unpublished:
+            print(f"Found {len(unpublished)} items the previous run could not publish")
+
+        resume = started_at is not None and resume_max_age is not None and time.time() - started_at < resume_max_age
+        if not resume:
+            started_at = time.time()
+            done = set()
+
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.file = open(self.path, "w", encoding="utf-8")
+
+        self.record("started", at=started_at)
+        if done:
+            self.record("done", ids=sorted(done))
+        if unpublished:
+            self.record("created", ids=unpublished)
+        return done, unpublished
+
+    def record(self, event, **fields):
+        if self.file is None:
+            return
+        line = json.dumps({"event": event, **fields}, separators=(",", ":"))
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def finish(self, unpublished=()):
+        """
+        Mark the run as complete. Only the `unpublished` item ids are kept in the journal, for
+        the next run to publish; its animes are synced again from scratch.
+        """
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
+        if not unpublished:
+            os.remove(self.path)
+            return
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"event": "created", "ids": list(unpublished)}, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def _load(self):
+        started_at = None
+        done = set()
+        created = []
+        published = set()
+
+        if not self.path or not os.path.exists(self.path):
+            return started_at, done, created, published
+
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # a line cut off by the crash; everything before it is valid
+
+                event = entry.get("event")
+                if event == "started":
+                    started_at = entry.get("at")
+                elif event == "done":
+                    done.update(entry["ids"])
+                elif event == "created":
+                    created.extend(entry["ids"])
+                elif event == "published":
+                    published.update(entry["ids"])
+
+        return started_at, done, created, published
@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+
+from anibridge.checkpoint import RunJournal
+from anibridge.playlist_state import PlaylistStateStore
+from anibridge.rate_limit import TokenBucket
+from anibridge.webflow import WebflowClient
+
+GOOGLE_SHEETS_SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+
+
+class Context:
+    """
+    Lazily created configuration and clients for the workflow scripts.
+
+    Importing a script only creates an empty context: secrets, credentials, the
+    spreadsheet, caches and state files are read the first time they are used, and
+    any of them can be replaced with `override()` (e.g. by tests or benchmarks).
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.RLock()
+
+    def override(self, name, value):
+        with self._lock:
+            self._values[name] = value
+
+    def _lazy(self, name, factory):
+        with self._lock:
+            if name not in self._values:
+                self._values[name] = factory()
+            return self._values[name]
+
+    # ----------------------------
+    # Webflow
+    # ----------------------------
+    @property
+    def webflow(self):
+        return self._lazy("webflow", lambda: WebflowClient(os.environ["WEBFLOW_API_SITE_TOKEN"]))
+
+    @property
+    def webflow_items(self):
+        # Where whole collections are read from: the local mirror, or the API when it is disabled.
+        return self._lazy("webflow_items", self._open_webflow_items)
+
+    def _open_webflow_items(self):
+        from anibridge.webflow_mirror import WEBFLOW_MIRROR_PATH, WebflowMirror
+
+        return WebflowMirror(self.webflow, WEBFLOW_MIRROR_PATH) if WEBFLOW_MIRROR_PATH else self.webflow
+
+    # ----------------------------
+    # YouTube
+    # ----------------------------
+    @property
+    def yt_api_key(self):
+        return self._lazy("yt_api_key", lambda: os.environ["YOUTUBE_API_KEY"])
+
+    @property
+    def yt_limiter(self):
+        # Shared YouTube request pacing for all workers (requests per second, burst size).
+        # Cached responses are not charged.
+        return self._lazy("yt_limiter", lambda: TokenBucket(
+            float(os.environ.get("YT_REQUESTS_PER_SECOND", "5")),
+            int(os.environ.get("YT_REQUESTS_BURST", "10")),
+            name="youtube",
+        ))
+
+    @property
+    def yt_cache(self):
+        # Imported here so scripts that never call YouTube (the exports) don't need the Google API client.
+        def open_cache():
+            from anibridge.youtube_cache import YouTubeResponseCache
+            return YouTubeResponseCache()
+
+        return self._lazy("yt_cache", open_cache)
+
+    @property
+    def playlist_state(self):
+        # Per-playlist ETags and known videos from previous runs, used to skip unchanged playlists.
+        return self._lazy("playlist_state", lambda: PlaylistStateStore(
+            os.environ.get("PLAYLIST_STATE_PATH", ".cache/playlist_state.json")
+        ))
+
+    @property
+    def sync_journal(self):
+        # Progress of the current sync run, to resume it if it crashes or times out.
+        return self._lazy("sync_journal", lambda: RunJournal(
+            os.environ.get("SYNC_JOURNAL_PATH", ".cache/sync_journal.jsonl")
+        ))
+
+    # ----------------------------
+    # Google Sheets
+    # ----------------------------
+    @property
+    def spreadsheet(self):
+        return self._lazy("spreadsheet", self._open_spreadsheet)
+
+    def worksheet(self, name):
+        return self._lazy(f"worksheet:{name}", lambda: self.spreadsheet.worksheet(name))
+
+    @property
+    def sheet_index(self):
+        # Known "added" rows and the "to add" rows already processed, so runs only read new rows.
+        def open_index():
+            from anibridge.sheet_index import SheetIndex
+            return SheetIndex(os.environ.get("SHEET_INDEX_PATH", ".cache/sheet_index.json"))
+
+        return self._lazy("sheet_index", open_index)
+
+    def _open_spreadsheet(self):
+        # Imported here so scripts that never touch the sheet don't need gspread installed.
+        import gspread
+        from google.oauth2.service_account import Credentials
+
+        creds_dict = json.loads(os.environ['GOOGLE_SERVICE_ACCOUNT_JSON'])
+        creds = Credentials.from_service_account_info(creds_dict, scopes=GOOGLE_SHEETS_SCOPES)
+        return gspread.authorize(creds).open_by_key(os.environ['GOOGLE_SHEET_ID'])
@@ -0,0 +1,169 @@
+import gzip
+import hashlib
+import json
+import os
+
+try:
+    import brotli  # optional, only needed for the .br variants
+except ImportError:
+    brotli = None
+
+
+def dump_json(value, pretty=False):
+    """
+    Serialize `value` the way the site expects it: UTF-8, non-ASCII characters kept as is,
+    either pretty-printed with 2 spaces (like `JSON.stringify(value, null, 2)`) or minified.
+    """
+    if pretty:
+        text = json.dumps(value, ensure_ascii=False, indent=2)
+    else:
+        text = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return text.encode("utf-8")
+
+
+def write_if_changed(path, data):
+    """
+    Write `data` (bytes) to `path` only when its SHA-256 differs from the file on disk,
+    so unchanged exports leave the file (and git) untouched. Returns True if written.
+    """
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            if hashlib.sha256(f.read()).digest() == hashlib.sha256(data).digest():
+                return False
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def write_json_variants(path, value, pretty=True):
+    """
+    Write `value` to `path` plus pre-compressed copies of its minified JSON (`.gz`, and
+    `.br` when brotli is installed). When `pretty` is set, `path` is pretty-printed and
+    the minified JSON gets its own `<name>.min.json` file.
+
+    Compression is deterministic (no timestamps), so the compressed files only change
+    when the JSON does. Returns the paths that were written.
+    """
+    minified = dump_json(value)
+    if pretty:
+        min_path = f"{os.path.splitext(path)[0]}.min.json"
+        outputs = [(path, dump_json(value, pretty=True)), (min_path, minified)]
+    else:
+        min_path = path
+        outputs = [(path, minified)]
+
+    outputs.append((f"{min_path}.gz", gzip.compress(minified, compresslevel=9, mtime=0)))
+    if brotli is not None:
+        outputs.append((f"{min_path}.br", brotli.compress(minified, quality=11)))
+
+    return [output_path for output_path, data in outputs if write_if_changed(output_path, data)]
+
+
+def write_shards(directory, records, index_record, page_size):
+    """
+    Split an export into small files for the frontend:
+
+    - `index.json`: `index_record(record)` for every record (plus `.gz`/`.br` copies).
+    - `<slug>.json`: one full record per slug.
+    - `pages/<n>.json`: the index in pages of `page_size` entries, numbered from 1.
+
+    Shards and pages that no longer exist are removed. Records without a slug are skipped.
+    A record with the slug `index` is listed but gets no shard, since it would overwrite
+    `index.json`. Returns `(written, removed)` path lists.
+    """
+    records = [record for record in records if record.get("slug")]
+    index = [index_record(record) for record in records]
+
+    written = write_json_variants(os.path.join(directory, "index.json"), index, pretty=False)
+
+    shard_paths = set()
+    for record in records:
+        if record["slug"] == "index":
+            print(f"Not writing the shard of the record with the reserved slug 'index' in {directory}")
+            continue
+        path = os.path.join(directory, f"{record['slug']}.json")
+        shard_paths.add(path)
+        if write_if_changed(path, dump_json(record)):
+            written.append(path)
+
+    pages_dir = os.path.join(directory, "pages")
+    page_count = max(1, -(-len(index) // page_size))
+    page_paths = set()
+    for number in range(1, page_count + 1):
+        path = os.path.join(pages_dir, f"{number}.json")
+        page_paths.add(path)
+        page = {
+            "page": number,
+            "pageCount": page_count,
+            "pageSize": page_size,
+            "total": len(index),
+            "items": index[(number - 1) * page_size:number * page_size],
+        }
+        if write_if_changed(path, dump_json(page)):
+            written.append(path)
+
+    removed = _remove_stale_json(directory, shard_paths | {os.path.join(directory, "index.json")})
+    removed += _remove_stale_json(pages_dir, page_paths)
+    return written, removed
+
+
+def _remove_stale_json(directory, keep):
+    removed = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.endswith(".json") and path not in keep:
+            os.remove(path)
+            removed.append(path)
+    return removed
+
+
+class ShardWriter:
+    """
+    Write one JSON file per key into `directory` plus a `manifest.json` that maps every
+    key to the content hash and size of its file, e.g. for `<key>.json?v=<hash>` URLs.
+
+    Files are written as they are added (only when their content changed), so callers
+    can stream shards without keeping them in memory. `finish()` writes the manifest and
+    removes the files of keys that were not added in this run. With `keep_existing`, the
+    keys of the current manifest are kept, so a few shards can be updated on their own.
+    The key `manifest` is skipped, since its file would overwrite the manifest.
+    """
+
+    def __init__(self, directory, keep_existing=False):
+        self.directory = directory
+        self.manifest = {}
+        self.written = []
+
+        manifest_path = os.path.join(directory, "manifest.json")
+        if keep_existing and os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+
+    def add(self, key, value):
+        if key == "manifest":
+            print(f"Skipping the shard with the reserved key 'manifest' in {self.directory}")
+            return
+        data = dump_json(value)
+        path = os.path.join(self.directory, f"{key}.json")
+        if write_if_changed(path, data):
+            self.written.append(path)
+        self.manifest[key] = {"hash": hashlib.sha256(data).hexdigest()[:16], "size": len(data)}
+
+    def finish(self):
+        """
+        Write the manifest and remove stale files. Returns `(written, removed)` path lists.
+        """
+        manifest_path = os.path.join(self.directory, "manifest.json")
+        if write_if_changed(manifest_path, dump_json(dict(sorted(self.manifest.items())))):
+            self.written.append(manifest_path)
+
+        os.makedirs(self.directory, exist_ok=True)
+        keep = {os.path.join(self.directory, f"{key}.json") for key in self.manifest} | {manifest_path}
+        return self.written, _remove_stale_json(self.directory, keep)
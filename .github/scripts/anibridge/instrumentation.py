@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Also write the run report to this file, e.g. to upload it as a workflow artifact.
+RUN_REPORT_PATH = os.environ.get("RUN_REPORT_PATH")
+
+
+class RunReport:
+    """
+    Per-run timings and counters, emitted as one JSON document at the end of a run.
+
+    - `span(name)`: wall time of a pipeline stage (re-entering a span adds to it).
+    - `count(api, name, value)`: per-API counters (requests, retries, 429s, sleep seconds...).
+    - `items(name, n)`: processed item counts, reported with a per-second throughput.
+
+    Safe to update from worker threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start()
+
+    def start(self, name=None):
+        with self.lock:
+            self.name = name
+            self.started_at = datetime.now(timezone.utc)
+            self.started = time.perf_counter()
+            self.spans = {}
+            self.apis = {}
+            self.item_counts = {}
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            with self.lock:
+                span = self.spans.setdefault(name, {"count": 0, "seconds": 0.0})
+                span["count"] += 1
+                span["seconds"] += seconds
+
+    def count(self, api, name, value=1):
+        with self.lock:
+            counters = self.apis.setdefault(api, {})
+            counters[name] = counters.get(name, 0) + value
+
+    def items(self, name, n=1):
+        with self.lock:
+            self.item_counts[name] = self.item_counts.get(name, 0) + n
+
+    def to_dict(self):
+        with self.lock:
+            wall_seconds = time.perf_counter() - self.started
+            return {
+                "run": self.name,
+                "started_at": self.started_at.isoformat(timespec="seconds").replace("+00:00", "Z"),
+                "wall_seconds": round(wall_seconds, 3),
+                "spans": {name: {"count": s["count"], "seconds": round(s["seconds"], 3)} for name, s in self.spans.items()},
+                "apis": {api: {name: _round(value) for name, value in counters.items()} for api, counters in self.apis.items()},
+                "items": dict(self.item_counts),
+                "items_per_second": {
+                    name: round(n / wall_seconds, 2) if wall_seconds else 0 for name, n in self.item_counts.items()
+                },
+            }
+
+    def emit(self):
+        report = self.to_dict()
+        print("Run report:")
+        print(json.dumps(report, indent=2))
+
+        if RUN_REPORT_PATH:
+            directory = os.path.dirname(RUN_REPORT_PATH)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(RUN_REPORT_PATH, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        return report
+
+
+def _round(value):
+    return round(value, 3) if isinstance(value, float) else value
+
+
+# Process-wide report shared by the scripts and the anibridge clients.
+REPORT = RunReport()
@@ -0,0 +1,76 @@
+import json
+import os
+import threading
+
+
+class PlaylistStateStore:
+    """
+    Persisted per-playlist sync state, stored as a single JSON file.
+
+    Each entry keeps the ETag of the first `playlistItems` page, the item count, when the
+    playlist was last checked and last had new videos (epoch seconds, for the sync schedule)
+    and a compact record of every video seen last time:
+
+        {
+            "etag": "...",
+            "item_count": 12,
+            "checked_at": 1700000000.0,
+            "changed_at": 1699000000.0,
+            "channel_id": "UC...",
+            "videos": {"<videoId>": {"title": "<localized title>", "publishedAt": "...", "position": 3}}
+        }
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.playlists = {}
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.playlists = json.load(f).get("playlists", {})
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable playlist state {path}: {e}")
+
+    def get(self, playlist_id):
+        with self.lock:
+            return self.playlists.get(playlist_id)
+
+    def set(self, playlist_id, state):
+        with self.lock:
+            self.playlists[playlist_id] = state
+
+    def update(self, playlist_id, **fields):
+        # Merge fields into an existing entry (e.g. a new `checked_at`); unknown playlists are ignored.
+        with self.lock:
+            if playlist_id in self.playlists:
+                self.playlists[playlist_id] = {**self.playlists[playlist_id], **fields}
+
+    def find_playlists(self, channel_id=None, video_id=None):
+        """
+        Return the ids of the playlists owned by `channel_id` or containing `video_id`.
+        """
+        with self.lock:
+            return [
+                playlist_id for playlist_id, state in self.playlists.items()
+                if (channel_id and state.get("channel_id") == channel_id)
+                or (video_id and video_id in state.get("videos", {}))
+            ]
+
+    def save(self):
+        if not self.path:
+            return
+
+        with self.lock:
+            data = {"playlists": self.playlists}
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Write to a temp file first so an interrupted run never leaves a broken state file.
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
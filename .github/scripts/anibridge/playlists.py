@@ -0,0 +1,195 @@
+import math
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from googleapiclient.errors import HttpError
+
+from anibridge.instrumentation import REPORT
+from anibridge.youtube import fetch_video_batches, get_youtube, timed_execute
+
+# Titles of playlist entries whose video can no longer be watched.
+UNAVAILABLE_TITLES = ("private video", "deleted video", "")
+
+# A playlist video with only the fields the pipelines use, parsed once from the YouTube
+# responses: `title` is the localized title, `published_at` the YouTube timestamp string,
+# `published_ts` the same time in epoch seconds (for sorting) and `position` the playlist
+# position (None when unknown).
+VideoRecord = namedtuple("VideoRecord", "video_id title published_at published_ts position")
+
+
+def fetch_playlist_videos(ctx, playlist_id, state=None, fresh=False):
+    """
+    Return the available videos of a playlist as VideoRecords, in playlist order.
+
+    Responses go through the context's YouTube cache and limiter; with `fresh` set, cached
+    `playlistItems` pages are not used (e.g. when YouTube just notified a change). With a
+    PlaylistStateStore as `state`, the first page is requested with the ETag of the previous
+    fetch and the known videos are reused when the playlist did not change; otherwise only
+    videos that are not in the state yet, or whose title in the playlist changed, are
+    fetched from the `videos` endpoint, and the state is updated.
+    """
+    yt = get_youtube(ctx.yt_api_key)
+    previous_state = state.get(playlist_id) if state is not None else None
+    known_videos = previous_state["videos"] if previous_state else {}
+    checked_at = time.time()
+    video_positions = {}           # videoId -> position, in playlist order
+    item_titles = {}               # videoId -> title in the playlist item snippet
+    next_page_token = None
+    first_page_etag = None
+    channel_id = previous_state.get("channel_id") if previous_state else None
+
+    # ----------------------------
+    # Get all video IDs + positions
+    # ----------------------------
+    while True:
+        params = {
+            "part": "snippet,contentDetails",
+            "playlistId": playlist_id,
+            "maxResults": 50,
+            "pageToken": next_page_token
+        }
+        response = None if fresh else ctx.yt_cache.get("playlistItems", params)
+
+        if response is None:
+            request = yt.playlistItems().list(**params)
+
+            # Ask YouTube to only send the first page if the playlist changed since the last run.
+            if next_page_token is None and previous_state and previous_state.get("etag"):
+                request.headers["If-None-Match"] = previous_state["etag"]
+
+            ctx.yt_limiter.acquire()
+            try:
+                response = timed_execute("playlistItems", request)
+            except HttpError as e:
+                if e.resp.status == 304:
+                    REPORT.count("youtube", "not_modified")
+                    state.update(playlist_id, checked_at=checked_at)
+                    print(f"Playlist {playlist_id} unchanged, reusing {len(known_videos)} known videos")
+                    return videos_from_state(previous_state)
+                raise
+            ctx.yt_cache.put("playlistItems", params, response)
+
+        if next_page_token is None:
+            first_page_etag = response.get("etag")
+
+            # A cached first page with the same ETag means the playlist did not change either.
+            if previous_state and first_page_etag and first_page_etag == previous_state.get("etag"):
+                state.update(playlist_id, checked_at=checked_at)
+                print(f"Playlist {playlist_id} unchanged, reusing {len(known_videos)} known videos")
+                return videos_from_state(previous_state)
+
+        for item in response.get("items", []):
+            channel_id = item["snippet"].get("channelId", channel_id)
+
+            # Known videos are not re-fetched, so drop the ones that went private/deleted here.
+            if item["snippet"].get("title", "").lower() in UNAVAILABLE_TITLES:
+                continue
+            video_id = item["contentDetails"]["videoId"]
+            video_positions[video_id] = item["snippet"]["position"]
+            item_titles[video_id] = item["snippet"]["title"]
+
+        # Pagination handling
+        next_page_token = response.get("nextPageToken")
+        if not next_page_token:
+            break
+
+    # ----------------------------
+    # Fetch video details in batches of 50, only for videos not seen before and known
+    # videos that were renamed (the stored title is the localized one, so it is refreshed
+    # from `videos` rather than taken from the playlist item).
+    # ----------------------------
+    videos = []
+    fetch_ids = []
+    for video_id, position in video_positions.items():
+        record = known_videos.get(video_id)
+        if record is not None and record.get("itemTitle") == item_titles[video_id]:
+            videos.append(video_from_record(video_id, record, position))
+        else:
+            fetch_ids.append(video_id)
+    new_video_ids = [video_id for video_id in fetch_ids if video_id not in known_videos]
+    renamed = len(fetch_ids) - len(new_video_ids)
+    if renamed:
+        REPORT.count("youtube", "renamed_videos", renamed)
+
+    # Cached details of a renamed video would still have the old title.
+    id_batches = [fetch_ids[i:i+50] for i in range(0, len(fetch_ids), 50)]
+    for response in fetch_video_batches(yt, id_batches, ctx.yt_cache, ctx.yt_limiter, fresh=fresh or bool(renamed)):
+        for video in response.get("items", []):
+            record = parse_video(video, video_positions.get(video["id"]))
+            if record is not None:
+                videos.append(record)
+
+    # Sort results by playlist position to guarantee correct order
+    videos.sort(key=_position_key)
+
+    if state is not None:
+        # The first fetch of a playlist finds only "new" videos, so it does not count as a change.
+        changed_at = previous_state.get("changed_at") if previous_state else None
+        if previous_state and new_video_ids:
+            changed_at = checked_at
+
+        state.set(playlist_id, {
+            "etag": first_page_etag,
+            "item_count": len(video_positions),
+            "checked_at": checked_at,
+            "changed_at": changed_at,
+            "channel_id": channel_id,
+            "videos": {v.video_id: record_from_video(v, item_titles.get(v.video_id)) for v in videos},
+        })
+
+    return videos
+
+
+def parse_video(video, position):
+    """
+    Return a VideoRecord for a `videos` resource, or None when the video is unavailable
+    (no snippet, private or deleted) or has no usable publish date.
+    """
+    snippet = video.get("snippet")
+    if not snippet:
+        return None
+
+    title = snippet.get("localized", {}).get("title", snippet.get("title", ""))
+    if title.lower() in UNAVAILABLE_TITLES or snippet.get("title", "").lower() in UNAVAILABLE_TITLES:
+        return None
+
+    published_ts = parse_timestamp(snippet.get("publishedAt"))
+    if published_ts is None:
+        print(f"Skipping video {video['id']}: invalid publishedAt {snippet.get('publishedAt')!r}")
+        return None
+
+    return VideoRecord(video["id"], title, snippet["publishedAt"], published_ts, position)
+
+
+def parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def episode_order(videos):
+    """
+    Return the videos in episode order: by publish date, then by playlist position.
+    """
+    return sorted(videos, key=lambda v: (v.published_ts, _position_key(v)))
+
+
+def record_from_video(video, item_title=None):
+    # `itemTitle` is the title in the playlist item, used to notice renamed videos.
+    return {"title": video.title, "itemTitle": item_title, "publishedAt": video.published_at, "position": video.position}
+
+
+def video_from_record(video_id, record, position):
+    return VideoRecord(video_id, record["title"], record["publishedAt"], parse_timestamp(record["publishedAt"]), position)
+
+
+def videos_from_state(state):
+    videos = [video_from_record(vid, record, record.get("position")) for vid, record in state["videos"].items()]
+    videos.sort(key=_position_key)
+    return videos
+
+
+def _position_key(video):
+    return math.inf if video.position is None else video.position
@@ -0,0 +1,44 @@
+import threading
+import time
+
+from anibridge.instrumentation import REPORT
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket used to pace API calls that are shared between workers.
+
+    `rate` is the number of tokens refilled per second and `capacity` is the largest
+    burst allowed. `acquire()` blocks until enough tokens are available and returns
+    the number of seconds it had to wait. Waits of a named bucket are added to the run
+    report as `<name>.limiter_sleep_seconds`.
+    """
+
+    def __init__(self, rate, capacity=None, name=None):
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.consumed = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    self.consumed += tokens
+                    if waited and self.name:
+                        REPORT.count(self.name, "limiter_sleep_seconds", waited)
+                    return waited
+
+                wait = (tokens - self.tokens) / self.rate
+
+            time.sleep(wait)
+            waited += wait
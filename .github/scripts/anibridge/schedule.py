@@ -0,0 +1,137 @@
+import math
+import os
+import statistics
+import time
+from collections import namedtuple
+from datetime import datetime
+
+DAY_SECONDS = 86400
+
+# YouTube quota units the sync may plan to spend on playlists per run. The API allows 10,000
+# units a day, shared with the Add Anime workflow. "0" removes the limit.
+SYNC_QUOTA_BUDGET = int(os.environ.get("SYNC_QUOTA_BUDGET", "8000"))
+
+# Playlists with a new video in the last SYNC_HOT_DAYS days (or twice their usual gap between
+# uploads, if longer), or released within SYNC_HOT_DAYS days of now, are checked every run.
+SYNC_HOT_DAYS = float(os.environ.get("SYNC_HOT_DAYS", "21"))
+
+# Days between checks of the other playlists: "warm" ones had a new video in the last
+# SYNC_COLD_AFTER_DAYS days, "cold" ones did not.
+SYNC_WARM_INTERVAL_DAYS = float(os.environ.get("SYNC_WARM_INTERVAL_DAYS", "3"))
+SYNC_COLD_AFTER_DAYS = float(os.environ.get("SYNC_COLD_AFTER_DAYS", "180"))
+SYNC_COLD_INTERVAL_DAYS = float(os.environ.get("SYNC_COLD_INTERVAL_DAYS", "14"))
+
+# A check made less than a whole interval ago is still due if it is within this margin, so
+# scheduled runs starting a little earlier than the day before do not skip a day.
+SCHEDULE_SLACK_SECONDS = 6 * 3600
+
+# Number of recent uploads used to estimate a playlist's upload cadence.
+CADENCE_UPLOADS = 6
+
+TIERS = ("hot", "warm", "cold")
+
+# A playlist considered for this run. `overdue` is the time since the last check divided by
+# the tier's interval (infinite when it was never checked); due playlists have overdue >= 1.
+PlaylistCheck = namedtuple("PlaylistCheck", "anime playlist_id tier overdue cost")
+
+# The plan of a run: the checks to make (in catalog order), the due checks that did not fit
+# in the quota budget, and the playlists that are not due yet.
+SyncPlan = namedtuple("SyncPlan", "check deferred not_due")
+
+
+def plan_playlist_checks(candidates, budget=SYNC_QUOTA_BUDGET, now=None):
+    """
+    Decide which playlists to check this run.
+
+    `candidates` yields `(anime, playlist_state, indexed_publish_dates)` per anime with a
+    playlist, where `playlist_state` is its PlaylistStateStore entry (or None) and
+    `indexed_publish_dates` are the publish dates of its Anime Videos items, used when the
+    playlist has no state yet.
+
+    Every due playlist is scored (see classify_playlist) and the due ones are picked hot
+    tier first, then most overdue first, until their estimated quota cost would exceed
+    `budget`. Playlists that do not fit stay due and, being more overdue, go first next run,
+    so cold playlists are checked on a rotation instead of all at once.
+    """
+    now = time.time() if now is None else now
+    due = []
+    not_due = []
+    for position, (anime, state, indexed_dates) in enumerate(candidates):
+        playlist_id = anime['fieldData']['youtube-playlist-id']
+        tier, interval = classify_playlist(anime['fieldData'].get('release-date'), state, indexed_dates, now)
+
+        checked_at = (state or {}).get("checked_at")
+        if checked_at is None or interval <= 0:
+            overdue = math.inf
+        else:
+            overdue = (now - checked_at + SCHEDULE_SLACK_SECONDS) / interval
+        check = PlaylistCheck(anime, playlist_id, tier, overdue, estimate_quota(state, tier, len(indexed_dates)))
+        if overdue >= 1:
+            due.append((position, check))
+        else:
+            not_due.append(check)
+
+    selected = []
+    deferred = []
+    spent = 0
+    for position, check in sorted(due, key=lambda entry: (TIERS.index(entry[1].tier), -entry[1].overdue, entry[0])):
+        if budget and spent + check.cost > budget:
+            deferred.append(check)
+            continue
+        spent += check.cost
+        selected.append((position, check))
+
+    selected.sort(key=lambda entry: entry[0])
+    return SyncPlan([check for _, check in selected], deferred, not_due)
+
+
+def classify_playlist(release_date, state, indexed_dates, now):
+    """
+    Return `(tier, check interval in seconds)` for a playlist, based on when it last had a
+    new video (its newest upload, or when the sync last found new videos in it), its upload
+    cadence and the anime's release date.
+    """
+    uploads = sorted(filter(None, map(_timestamp, _upload_dates(state, indexed_dates))))
+    last_activity = max(uploads[-1:] + [(state or {}).get("changed_at") or 0], default=0)
+
+    hot_window = SYNC_HOT_DAYS * DAY_SECONDS
+    recent = uploads[-CADENCE_UPLOADS:]
+    if len(recent) >= 2:
+        cadence = statistics.median(b - a for a, b in zip(recent, recent[1:]))
+        hot_window = min(max(hot_window, 2 * cadence), SYNC_COLD_AFTER_DAYS * DAY_SECONDS)
+
+    released = _timestamp(release_date)
+    if now - last_activity <= hot_window or (released and abs(now - released) <= SYNC_HOT_DAYS * DAY_SECONDS):
+        return "hot", 0
+    if now - last_activity <= SYNC_COLD_AFTER_DAYS * DAY_SECONDS:
+        return "warm", SYNC_WARM_INTERVAL_DAYS * DAY_SECONDS
+    return "cold", SYNC_COLD_INTERVAL_DAYS * DAY_SECONDS
+
+
+def estimate_quota(state, tier, indexed_count):
+    """
+    Estimate the YouTube quota units a check costs (one unit per `playlistItems` page or
+    `videos` batch of 50). A playlist with an ETag usually answers "not modified" for one
+    unit; a hot one is expected to change, so all of its pages and one batch of new videos
+    are counted. A playlist without state is fetched in full.
+    """
+    if not state or not state.get("etag"):
+        return 2 * max(1, math.ceil(indexed_count / 50))
+    if tier == "hot":
+        return max(1, math.ceil(state.get("item_count", 0) / 50)) + 1
+    return 1
+
+
+def _upload_dates(state, indexed_dates):
+    if state and state.get("videos"):
+        return [record.get("publishedAt") for record in state["videos"].values()]
+    return indexed_dates
+
+
+def _timestamp(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
@@ -0,0 +1,63 @@
+import re
+import unicodedata
+
+# Shortest and longest prefix indexed for every token. Whole tokens are always indexed.
+SEARCH_MIN_PREFIX = 2
+SEARCH_MAX_PREFIX = 12
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def normalize(text):
+    """
+    Fold text for matching: compatibility-decompose it, drop combining marks (accents)
+    and lowercase it, so "Pokémon", "POKEMON" and "ｐｏｋｅｍｏｎ" all become "pokemon".
+    Mirrors `s.normalize("NFKD").replace(/\\p{M}/gu, "").toLowerCase()` in the browser.
+    """
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def build_search_index(records, fields, min_prefix=SEARCH_MIN_PREFIX, max_prefix=SEARCH_MAX_PREFIX):
+    """
+    Build an inverted index over the `fields` of export records.
+
+    `docs` holds `[slug, name]` for every record, and `terms` maps every token and token
+    prefix (`min_prefix` to `max_prefix` characters) to the ascending positions of the
+    records in `docs` that contain it. A query is answered by normalizing and tokenizing
+    it the same way, cutting each token to `max_prefix` characters and intersecting the
+    postings of its tokens, with no per-record scanning.
+    """
+    docs = []
+    terms = {}
+    for position, record in enumerate(records):
+        docs.append([record.get("slug"), record.get("name")])
+
+        grams = set()
+        for token in tokenize(" ".join(_field_text(record.get(field)) for field in fields)):
+            grams.add(token[:max_prefix])
+            grams.update(token[:n] for n in range(min_prefix, min(len(token), max_prefix) + 1))
+
+        for gram in grams:
+            terms.setdefault(gram, []).append(position)
+
+    return {
+        "version": 1,
+        "minPrefix": min_prefix,
+        "maxPrefix": max_prefix,
+        "docFields": ["slug", "name"],
+        "docs": docs,
+        "terms": dict(sorted(terms.items())),
+    }
+
+
+def _field_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return " ".join(_field_text(v) for v in value)
+    return str(value)
@@ -0,0 +1,142 @@
+import json
+import os
+
+from anibridge.instrumentation import REPORT
+from anibridge.search import tokenize
+
+
+def normalize_title(title):
+    # Case, accents, punctuation and spacing do not make a different title.
+    return " ".join(tokenize(str(title)))
+
+
+class SheetIndex:
+    """
+    Persisted index of the "added" sheet, so the Add Anime workflow only reads its new rows.
+
+    It keeps the playlist ids and normalized titles of the rows, how many rows are indexed
+    and the values of the last one. A run reads the sheet from that last row down: if it is
+    unchanged, only the rows after it are indexed; if not (rows were edited, deleted or
+    sorted), the index is rebuilt from the whole sheet. Row 1 is the header.
+
+    The "to add" sheet is read whole: its processed rows are cleared, and the API leaves out
+    trailing empty rows, so it only holds the entries waiting to be added.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.added_rows = 0            # data rows of "added" covered by the index
+        self.added_last_row = None     # values of the last of them
+        self.added_header = None
+        self.added_playlist_ids = set()
+        self.added_titles = set()
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                added = data.get("added", {})
+                self.added_rows = added.get("rows", 0)
+                self.added_last_row = added.get("last_row")
+                self.added_playlist_ids = set(added.get("playlist_ids", []))
+                self.added_titles = set(added.get("titles", []))
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable sheet index {path}: {e}")
+
+    # ----------------------------
+    # "added" sheet
+    # ----------------------------
+    def refresh_added(self, worksheet):
+        """
+        Bring the index of the "added" sheet up to date.
+        """
+        if self.added_rows:
+            header, rows = _read_rows(worksheet, self.added_rows + 1)
+            if rows and _trim(rows[0]) == self.added_last_row:
+                self._index_added(header, rows[1:])
+                return
+            print("The \"added\" sheet changed since the last run, rebuilding its index")
+
+        self.added_rows = 0
+        self.added_last_row = None
+        self.added_playlist_ids = set()
+        self.added_titles = set()
+        header, rows = _read_rows(worksheet, 2)
+        self._index_added(header, rows)
+
+    def record_added(self, rows):
+        """
+        Index rows this run appended to the "added" sheet (in sheet column order).
+        """
+        if self.added_header is not None:
+            self._index_added(self.added_header, rows)
+
+    def _index_added(self, header, rows):
+        self.added_header = header
+        title_col = header.index("anime_title")
+        playlist_col = header.index("youtube_playlist_id")
+        for row in rows:
+            row = _pad(row, len(header))
+            if row[playlist_col]:
+                self.added_playlist_ids.add(str(row[playlist_col]))
+            if row[title_col]:
+                self.added_titles.add(normalize_title(row[title_col]))
+        self.added_rows += len(rows)
+        if rows:
+            self.added_last_row = _trim(rows[-1])
+
+    # ----------------------------
+    # "to add" sheet
+    # ----------------------------
+    def read_to_add(self, worksheet):
+        """
+        Return `(row number, record)` for the non-empty "to add" rows.
+        """
+        header, rows = _read_rows(worksheet, 2)
+        return [
+            (2 + offset, dict(zip(header, _pad(row, len(header)))))
+            for offset, row in enumerate(rows) if any(_trim(row))
+        ]
+
+    def save(self):
+        if not self.path:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        data = {
+            "added": {
+                "rows": self.added_rows,
+                "last_row": self.added_last_row,
+                "playlist_ids": sorted(self.added_playlist_ids),
+                "titles": sorted(self.added_titles),
+            },
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+
+def _read_rows(worksheet, start):
+    """
+    Read the header row and the rows from row `start` down, in one request.
+    """
+    header, rows = worksheet.batch_get(["1:1", f"A{start}:ZZ"])
+    REPORT.count("sheets", "reads")
+    REPORT.count("sheets", "rows_read", len(rows))
+    return [str(cell) for cell in (header[0] if header else [])], [list(row) for row in rows]
+
+
+def _trim(row):
+    # The Sheets API leaves out trailing empty cells, so compare rows without them.
+    row = [str(cell) for cell in row]
+    while row and not row[-1].strip():
+        row.pop()
+    return row
+
+
+def _pad(row, width):
+    return [str(cell) for cell in row] + [""] * (width - len(row))
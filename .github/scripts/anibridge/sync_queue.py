@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import Counter
+
+
+class SyncQueue:
+    """
+    De-duplicating queue of targeted syncs, run one at a time by a worker thread.
+
+    `put(key, **kwargs)` asks for `handler(**kwargs)` to run. A key (e.g. a playlist id)
+    that is already waiting is not queued again, and a sync only starts `delay` seconds
+    after it was first requested, so a burst of notifications about the same anime (an
+    upload followed by title edits, or the same change reported by Webflow and YouTube)
+    becomes one sync. A key requested while its sync is running is queued again, since the
+    running sync may have read the playlist before the change.
+    """
+
+    def __init__(self, handler, delay=0.0):
+        self.handler = handler
+        self.delay = delay
+        self.cond = threading.Condition()
+        self.pending = {}      # key -> (monotonic time it is due, kwargs), in request order
+        self.running = None
+        self.stopped = False
+        self.stats = Counter()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def put(self, key, **kwargs):
+        """
+        Queue a sync unless one for `key` is already waiting. Returns True if it was queued.
+        """
+        with self.cond:
+            self.stats["requested"] += 1
+            if key in self.pending:
+                self.stats["deduplicated"] += 1
+                return False
+            self.pending[key] = (time.monotonic() + self.delay, kwargs)
+            self.cond.notify_all()
+            return True
+
+    def join(self, timeout=None):
+        """
+        Wait until no sync is waiting or running. Returns False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while self.pending or self.running is not None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while True:
+                    if self.stopped:
+                        return
+                    if self.pending:
+                        # Every key waits the same delay, so the oldest request is due first.
+                        key, (due, kwargs) = next(iter(self.pending.items()))
+                        if due <= time.monotonic():
+                            break
+                        self.cond.wait(due - time.monotonic())
+                    else:
+                        self.cond.wait()
+                del self.pending[key]
+                self.running = key
+
+            try:
+                self.handler(**kwargs)
+                self.stats["synced"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"Sync of {key} failed: {e}")
+            finally:
+                with self.cond:
+                    self.running = None
+                    self.cond.notify_all()
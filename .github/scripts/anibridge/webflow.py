@@ -0,0 +1,455 @@
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from anibridge.instrumentation import REPORT
+
+WEBFLOW_API_BASE_URL = os.environ.get("WEBFLOW_API_BASE_URL", "https://api.webflow.com/v2")
+
+# Webflow v2 accepts at most 100 items per bulk create, update or delete request.
+WEBFLOW_BULK_ITEM_LIMIT = 100
+
+# Bulk request errors caused by the items themselves (invalid, conflicting or no longer
+# existing). The request is split in halves to find the items, and sending those items
+# again later will not help.
+WEBFLOW_REJECTED_STATUSES = (400, 404, 409, 422)
+
+# Webflow API's max limit per list request.
+WEBFLOW_PAGE_LIMIT = 100
+
+# Number of collection pages fetched in parallel.
+WEBFLOW_FETCH_WORKERS = int(os.environ.get("WEBFLOW_FETCH_WORKERS", "4"))
+
+# Webflow's rate limit window when the response does not say otherwise.
+RATE_LIMIT_WINDOW_SECONDS = 60
+
+# Start spreading requests evenly once less than this share of the quota is left.
+RATE_LIMIT_LOW_WATER = 0.2
+
+
+class BulkFailure(namedtuple("BulkFailure", "status text")):
+    """
+    Why items of a bulk request failed: the HTTP status and body of the error response.
+    Prints like the error message the scripts log.
+    """
+
+    __slots__ = ()
+
+    def __str__(self):
+        return f"Webflow error {self.status}: {self.text}"
+
+
+def is_rejected(reason):
+    """
+    Return True if a bulk failure reason means Webflow rejected the items for good.
+    """
+    return isinstance(reason, BulkFailure) and reason.status in WEBFLOW_REJECTED_STATUSES
+
+
+class WebflowClient:
+    """
+    Webflow API client shared by the workflow scripts.
+
+    Keeps a pooled keep-alive `requests.Session`, paces requests from the
+    `X-RateLimit-*` response headers and retries 429/5xx responses and connection
+    errors with jittered exponential backoff. Item creates (`POST .../items`) are not
+    idempotent, so they are not retried after a 5xx or a read timeout: Webflow may have
+    created the items already, and sending them again would create duplicates. Safe to use
+    from several threads.
+    """
+
+    def __init__(self, token, base_url=WEBFLOW_API_BASE_URL, max_retries=10, pool_size=10,
+                 backoff_base=1.0, backoff_cap=60.0, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+            "accept": "application/json",
+        })
+
+        self.lock = threading.Lock()
+        self.next_request_at = 0.0
+        self.spacing = 0.0  # seconds between requests while the quota is low
+
+    # ----------------------------
+    # HTTP
+    # ----------------------------
+    def request(self, method, path, **kwargs):
+        url = path if path.startswith("http") else f"{self.base_url}{path}"
+        kwargs.setdefault("timeout", self.timeout)
+        is_create = method == "POST" and url.split("?")[0].rstrip("/").endswith("/items")
+
+        response = None
+        for attempt in range(self.max_retries):
+            self._wait_for_slot()
+
+            REPORT.count("webflow", "requests")
+            if attempt:
+                REPORT.count("webflow", "retries")
+
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                REPORT.count("webflow", "connection_errors")
+                if attempt == self.max_retries - 1 or (is_create and isinstance(e, requests.ReadTimeout)):
+                    raise
+                delay = self._backoff(attempt)
+                print(f"Request error ({e}), retrying in {delay:.1f}s...")
+                self._sleep(delay)
+                continue
+
+            self._update_pace(response)
+
+            if response.status_code == 429:  # rate limited
+                REPORT.count("webflow", "rate_limited_429")
+                retry_after = _header_float(response, "Retry-After")
+                delay = retry_after + random.uniform(0, 1) if retry_after is not None else self._backoff(attempt)
+                print(f"Rate limit hit, waiting {delay:.1f}s...")
+                self._sleep(delay)
+                continue
+
+            if response.status_code >= 500:
+                REPORT.count("webflow", "server_errors")
+                if is_create:
+                    print(f"Error {response.status_code}: {response.text}, not retrying the create")
+                    return response
+                delay = self._backoff(attempt)
+                print(f"Error {response.status_code}: {response.text}, retrying in {delay:.1f}s...")
+                self._sleep(delay)
+                continue
+
+            # Success, or a client error that retrying will not fix.
+            if not response.ok:
+                REPORT.count("webflow", "client_errors")
+                print(f"Error {response.status_code}: {response.text}")
+            return response
+
+        return response  # last response (could be error)
+
+    def get(self, path, params=None):
+        return self.request("GET", path, params=params)
+
+    def post(self, path, json_data):
+        return self.request("POST", path, json=json_data)
+
+    def patch(self, path, json_data):
+        return self.request("PATCH", path, json=json_data)
+
+    def delete(self, path, json_data=None):
+        return self.request("DELETE", path, json=json_data)
+
+    def _backoff(self, attempt):
+        # Full jitter: a random delay up to the exponential cap, but never less than the base.
+        return max(self.backoff_base, random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt)))
+
+    def _wait_for_slot(self):
+        # Each request reserves its slot, so concurrent workers are spaced out instead of
+        # all waking up at the same `next_request_at`.
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_request_at)
+            self.next_request_at = slot + self.spacing
+        if slot > now:
+            self._sleep(slot - now)
+
+    def _sleep(self, seconds):
+        REPORT.count("webflow", "sleep_seconds", seconds)
+        time.sleep(seconds)
+
+    def _update_pace(self, response):
+        remaining = _header_float(response, "X-RateLimit-Remaining")
+        limit = _header_float(response, "X-RateLimit-Limit")
+        if remaining is None:
+            return
+
+        reset_after = _header_float(response, "X-RateLimit-Reset")
+        window = reset_after if reset_after is not None else RATE_LIMIT_WINDOW_SECONDS
+
+        with self.lock:
+            if remaining <= 0:
+                # Nothing left: wait for the window to reset, then send at full speed again.
+                self.spacing = 0.0
+                self.next_request_at = max(self.next_request_at, time.monotonic() + window)
+            elif limit and remaining < limit * RATE_LIMIT_LOW_WATER:
+                # Spread what is left of the quota over the rest of the window.
+                self.spacing = window / remaining
+            else:
+                self.spacing = 0.0
+
+    # ----------------------------
+    # Collections
+    # ----------------------------
+    def fetch_all_items(self, collection_id, workers=None):
+        """
+        Return every item of a collection, in the collection's order.
+        """
+        pages = dict(self._iter_offset_pages(collection_id, workers))
+        return [item for offset in sorted(pages) for item in pages[offset]]
+
+    def iter_item_pages(self, collection_id, workers=None):
+        """
+        Yield the items of a collection one page (list of items) at a time.
+
+        The first page is fetched alone to read `pagination.total`, then the remaining
+        offsets are fetched concurrently and yielded as they arrive, so pages after the
+        first are not in collection order.
+        """
+        for _, items in self._iter_offset_pages(collection_id, workers):
+            yield items
+
+    def _iter_offset_pages(self, collection_id, workers=None):
+        workers = workers or WEBFLOW_FETCH_WORKERS
+        limit = WEBFLOW_PAGE_LIMIT
+
+        data = self._fetch_items_page(collection_id, 0, limit)
+        items = data.get("items", [])
+        yield 0, items
+        if len(items) < limit:
+            return
+
+        total = data.get("pagination", {}).get("total", 0)
+        offsets = list(range(limit, total, limit))
+        next_offset = limit
+
+        if offsets:
+            last_page_full = False
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(self._fetch_items_page, collection_id, offset, limit): offset
+                    for offset in offsets
+                }
+                for future in as_completed(futures):
+                    # Drop the future once consumed so finished pages are not kept in memory.
+                    offset = futures.pop(future)
+                    items = future.result().get("items", [])
+                    if offset == offsets[-1]:
+                        last_page_full = len(items) == limit
+                    yield offset, items
+
+            if not last_page_full:
+                return
+            next_offset = offsets[-1] + limit
+
+        # Items added while fetching push the collection past the first page's total.
+        while True:
+            items = self._fetch_items_page(collection_id, next_offset, limit).get("items", [])
+            if not items:
+                break
+            yield next_offset, items
+            if len(items) < limit:
+                break
+            next_offset += limit
+
+    def _fetch_items_page(self, collection_id, offset, limit):
+        response = self.get(f"/collections/{collection_id}/items", params={"offset": offset, "limit": limit})
+        if not response.ok:
+            print("Error fetching items:", response.status_code, response.text)
+            # A missing page would look like missing items to the callers, so never skip it.
+            response.raise_for_status()
+        return response.json()
+
+    def bulk_create_items(self, collection_id, items, key_fields, chunk_size=WEBFLOW_BULK_ITEM_LIMIT):
+        """
+        Create collection items with `{"items": [...]}` requests of at most `chunk_size` items.
+
+        Created items are matched back to the input by their `fieldData` values of
+        `key_fields` (a field slug or a tuple of them). Inputs with the same key get the
+        created items with that key in response order. When a chunk is rejected as invalid
+        it is split in halves and retried, so a single bad item only fails itself.
+
+        Returns `(created, failed)` where `created` is a list of `(item, new_item_id)` in
+        input order and `failed` is a list of `(item, reason)`.
+        """
+        created = []
+        failed = []
+        if isinstance(key_fields, str):
+            key_fields = (key_fields,)
+
+        def key_of(item):
+            field_data = item.get("fieldData") or {}
+            return tuple(field_data.get(field) for field in key_fields)
+
+        def send(chunk):
+            return self.post(f"/collections/{collection_id}/items", {"items": chunk})
+
+        def on_success(chunk, response):
+            new_items = response.json().get("items", [])
+            new_ids_by_key = {}
+            for new_item in new_items:
+                new_ids_by_key.setdefault(key_of(new_item), []).append(new_item["id"])
+            for index, item in enumerate(chunk):
+                new_ids = new_ids_by_key.get(key_of(item))
+                new_id = new_ids.pop(0) if new_ids else None
+                if not new_id and len(new_items) == len(chunk):
+                    new_id = new_items[index]["id"]  # response without fieldData, same order as the request
+                if new_id:
+                    created.append((item, new_id))
+                else:
+                    failed.append((item, "Item missing from Webflow bulk create response"))
+
+        for i in range(0, len(items), chunk_size):
+            self._send_in_halves(send, items[i:i + chunk_size], on_success, failed)
+        return created, failed
+
+    def bulk_update_items(self, collection_id, items, chunk_size=WEBFLOW_BULK_ITEM_LIMIT):
+        """
+        Update collection items with `PATCH {"items": [...]}` requests of at most `chunk_size`
+        items. Each item needs its `id` plus the changed `fieldData` and/or `isArchived`/`isDraft`.
+
+        Returns `(updated, failed)`: the ids of the updated items and a list of `(item, reason)`.
+        """
+        updated = []
+        failed = []
+
+        def send(chunk):
+            return self.patch(f"/collections/{collection_id}/items", {"items": chunk})
+
+        def on_success(chunk, response):
+            updated.extend(item["id"] for item in chunk)
+
+        for i in range(0, len(items), chunk_size):
+            self._send_in_halves(send, items[i:i + chunk_size], on_success, failed)
+        return updated, failed
+
+    def bulk_delete_items(self, collection_id, item_ids, live=False, chunk_size=WEBFLOW_BULK_ITEM_LIMIT):
+        """
+        Delete collection items in chunks of at most `chunk_size` ids. With `live=True` the
+        items are only unpublished from the live site and stay in the collection.
+
+        Returns `(deleted, failed)`: the deleted item ids and a list of `(item_id, reason)`.
+        """
+        path = f"/collections/{collection_id}/items/live" if live else f"/collections/{collection_id}/items"
+        deleted = []
+        failed = []
+
+        def send(chunk):
+            return self.delete(path, {"items": [{"id": item_id} for item_id in chunk]})
+
+        def on_success(chunk, response):
+            deleted.extend(chunk)
+
+        for i in range(0, len(item_ids), chunk_size):
+            self._send_in_halves(send, item_ids[i:i + chunk_size], on_success, failed)
+        return deleted, failed
+
+    def _send_in_halves(self, send, chunk, on_success, failed):
+        response = send(chunk)
+
+        if not response.ok:
+            # Only a rejection can be caused by some of the items. Auth errors, 429s and 5xx left
+            # after the retries (creates are not retried) fail the whole chunk: splitting would
+            # multiply the requests, and a create may have been partly written.
+            if len(chunk) == 1 or response.status_code not in WEBFLOW_REJECTED_STATUSES:
+                reason = BulkFailure(response.status_code, response.text)
+                failed.extend((item, reason) for item in chunk)
+                return
+
+            # Narrow down which item(s) Webflow rejected.
+            middle = len(chunk) // 2
+            self._send_in_halves(send, chunk[:middle], on_success, failed)
+            self._send_in_halves(send, chunk[middle:], on_success, failed)
+            return
+
+        on_success(chunk, response)
+
+    def publish_items(self, collection_id, item_ids, chunk_size=WEBFLOW_BULK_ITEM_LIMIT):
+        """
+        Publish items with `{"itemIds": [...]}` requests of at most `chunk_size` ids. Invalid
+        chunks are split in halves like in `bulk_create_items()`.
+
+        Returns `(published, failed)`: the published item ids and a list of `(item_id, reason)`.
+        """
+        published = []
+        failed = []
+
+        def send(chunk):
+            return self.post(f"/collections/{collection_id}/items/publish", {"itemIds": chunk})
+
+        def on_success(chunk, response):
+            body = response.json() if response.content else {}
+            published_ids = body.get("publishedItemIds")
+            if published_ids is None:
+                published.extend(chunk)
+                return
+            published_ids = set(published_ids)
+            for item_id in chunk:
+                if item_id in published_ids:
+                    published.append(item_id)
+                else:
+                    failed.append((item_id, f"Not published: {body.get('errors') or 'missing from response'}"))
+
+        for i in range(0, len(item_ids), chunk_size):
+            self._send_in_halves(send, item_ids[i:i + chunk_size], on_success, failed)
+        return published, failed
+
+
+class PublishQueue:
+    """
+    Publishes items of one collection in chunks as soon as a chunk is full, instead of
+    all at once at the end of a run.
+
+    `on_published(item_ids)` is called after every chunk with the ids that went live.
+    `requires` is another PublishQueue that is flushed before each chunk, e.g. to publish
+    referenced Animes items before their Anime Videos items.
+    """
+
+    def __init__(self, client, collection_id, chunk_size=WEBFLOW_BULK_ITEM_LIMIT, on_published=None, requires=None):
+        self.client = client
+        self.collection_id = collection_id
+        self.chunk_size = chunk_size
+        self.on_published = on_published
+        self.requires = requires
+        self.pending = []
+        self.published = []
+        self.failed = []
+
+    def add(self, item_ids):
+        self.pending.extend(item_ids)
+        while len(self.pending) >= self.chunk_size:
+            self._send(self.pending[:self.chunk_size])
+            del self.pending[:self.chunk_size]
+
+    def flush(self):
+        if self.pending:
+            self._send(self.pending)
+            self.pending = []
+
+    def _send(self, item_ids):
+        if self.requires is not None:
+            self.requires.flush()
+
+        with REPORT.span("publish"):
+            published, failed = self.client.publish_items(self.collection_id, item_ids, self.chunk_size)
+        REPORT.items("items_published", len(published))
+
+        for item_id, reason in failed:
+            print(f"Error publishing item {item_id} in collection {self.collection_id}: {reason}")
+        print(f"Published {len(published)} of {len(item_ids)} items in collection {self.collection_id}")
+
+        self.published.extend(published)
+        self.failed.extend(failed)
+        if published and self.on_published:
+            self.on_published(published)
+
+
+def _header_float(response, name):
+    value = response.headers.get(name)
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
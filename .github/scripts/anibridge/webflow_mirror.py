@@ -0,0 +1,287 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from anibridge.instrumentation import REPORT
+from anibridge.webflow import WEBFLOW_PAGE_LIMIT
+
+WEBFLOW_MIRROR_PATH = os.environ.get("WEBFLOW_MIRROR_PATH", ".cache/webflow_mirror.sqlite")
+
+# A delta refresh cannot see deleted items, so the whole collection is re-downloaded this often.
+WEBFLOW_MIRROR_FULL_REFRESH_SECONDS = float(os.environ.get("WEBFLOW_MIRROR_FULL_REFRESH_HOURS", "168")) * 3600
+
+# Item field the delta refresh sorts by. The list items endpoint can only sort by
+# `lastPublished`, `name` or `slug`, so edits that were not published are only picked up
+# by the next full refresh.
+WEBFLOW_MIRROR_SORT_FIELD = "lastPublished"
+
+# Version of the mirror's tables, stored in the SQLite `user_version`.
+WEBFLOW_MIRROR_SCHEMA_VERSION = 1
+
+
+class WebflowMirror:
+    """
+    Local SQLite copy of Webflow collections, refreshed incrementally.
+
+    The first refresh of a collection downloads every item, streaming the pages into
+    SQLite. Later refreshes list the items sorted by `lastPublished` (newest first) and stop
+    at the first item that is not newer than the previous refresh, so a run only downloads
+    what was published since then. A full refresh is done instead when the delta cannot be
+    trusted: the request failed or the API ignored the sort, the item count does not match
+    `pagination.total` (items were created as drafts or deleted), or the last full refresh
+    is older than WEBFLOW_MIRROR_FULL_REFRESH_HOURS.
+
+    `fetch_all_items()` and `iter_item_pages()` refresh the collection and then read it
+    locally, so the mirror can be used wherever a WebflowClient is read from. When nothing
+    changed, a refresh is a single list request. Writers record their updates and deletes
+    with `apply_updates()` and `remove_items()`, since not all of them change what a delta
+    refresh sees.
+    """
+
+    def __init__(self, client, path=WEBFLOW_MIRROR_PATH, full_refresh_seconds=WEBFLOW_MIRROR_FULL_REFRESH_SECONDS):
+        self.client = client
+        self.full_refresh_seconds = full_refresh_seconds
+        self.lock = threading.Lock()
+        self.refreshed = set()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(f"PRAGMA user_version = {WEBFLOW_MIRROR_SCHEMA_VERSION}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " collection_id TEXT NOT NULL,"
+            " item_id TEXT NOT NULL,"
+            " position INTEGER NOT NULL,"
+            " last_updated TEXT,"
+            " playlist_id TEXT,"
+            " video_id TEXT,"
+            " anime_id TEXT,"
+            " body TEXT NOT NULL,"
+            " PRIMARY KEY (collection_id, item_id))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS items_position ON items (collection_id, position)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS items_playlist_id ON items (collection_id, playlist_id)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS items_video_id ON items (collection_id, video_id)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS items_anime_id ON items (collection_id, anime_id)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS collections ("
+            " collection_id TEXT PRIMARY KEY,"
+            " watermark TEXT,"
+            " full_refresh_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    # ----------------------------
+    # Reads (WebflowClient-compatible)
+    # ----------------------------
+    def fetch_all_items(self, collection_id, workers=None):
+        return [item for page in self.iter_item_pages(collection_id) for item in page]
+
+    def iter_item_pages(self, collection_id, workers=None, page_size=1000):
+        """
+        Refresh the collection and yield its items in collection order, `page_size` at a time.
+        """
+        self.refresh(collection_id)
+        last_position = -1
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT position, body FROM items WHERE collection_id = ? AND position > ?"
+                    " ORDER BY position LIMIT ?",
+                    (collection_id, last_position, page_size),
+                ).fetchall()
+            if not rows:
+                return
+            last_position = rows[-1][0]
+            yield [json.loads(body) for _, body in rows]
+
+    def find_items(self, collection_id, item_id=None, playlist_id=None, video_id=None, anime_id=None):
+        """
+        Return the mirrored items matching the given item id, YouTube playlist id, YouTube
+        video id and/or Animes item id (`anime-title-3`), using the indexes on those fields. The
+        collection is only refreshed the first time it is queried.
+        """
+        if collection_id not in self.refreshed:
+            self.refresh(collection_id)
+        query = "SELECT body FROM items WHERE collection_id = ?"
+        params = [collection_id]
+        filters = (("item_id", item_id), ("playlist_id", playlist_id), ("video_id", video_id), ("anime_id", anime_id))
+        for column, value in filters:
+            if value is not None:
+                query += f" AND {column} = ?"
+                params.append(value)
+        with self.lock:
+            rows = self.conn.execute(query + " ORDER BY position", params).fetchall()
+        return [json.loads(body) for body, in rows]
+
+    # ----------------------------
+    # Local writes
+    # ----------------------------
+    def apply_updates(self, collection_id, updates):
+        """
+        Apply bulk PATCH changes (`id` plus `fieldData` and/or `isArchived`/`isDraft`) that
+        were sent to Webflow. Archiving does not change `lastPublished` or the item count, so
+        a delta refresh would not notice it.
+        """
+        with self.lock:
+            for update in updates:
+                row = self.conn.execute(
+                    "SELECT position, body FROM items WHERE collection_id = ? AND item_id = ?",
+                    (collection_id, update["id"]),
+                ).fetchone()
+                if row is None:
+                    continue
+                item = json.loads(row[1])
+                item["fieldData"].update(update.get("fieldData", {}))
+                for flag in ("isArchived", "isDraft"):
+                    if flag in update:
+                        item[flag] = update[flag]
+                self._upsert(collection_id, [item], row[0])
+            self.conn.commit()
+
+    def remove_items(self, collection_id, item_ids):
+        """
+        Drop items that were deleted from Webflow.
+        """
+        with self.lock:
+            self.conn.executemany(
+                "DELETE FROM items WHERE collection_id = ? AND item_id = ?",
+                [(collection_id, item_id) for item_id in item_ids],
+            )
+            self.conn.commit()
+
+    # ----------------------------
+    # Refresh
+    # ----------------------------
+    def refresh(self, collection_id, force_full=False):
+        """
+        Bring the collection up to date, with a delta refresh when possible.
+        """
+        with REPORT.span("mirror_refresh"):
+            with self.lock:
+                row = self.conn.execute(
+                    "SELECT watermark, full_refresh_at FROM collections WHERE collection_id = ?", (collection_id,)
+                ).fetchone()
+
+            if force_full or row is None or time.time() - row[1] > self.full_refresh_seconds:
+                self._full_refresh(collection_id)
+            elif not self._delta_refresh(collection_id, row[0]):
+                self._full_refresh(collection_id)
+
+        self.refreshed.add(collection_id)
+
+    def _full_refresh(self, collection_id):
+        # Pages are written as they arrive (the page offset gives the positions), so only one
+        # page is in memory at a time. The lock is held throughout so that readers never see
+        # a half-written collection.
+        count = 0
+        watermark = None
+        with self.lock:
+            try:
+                self.conn.execute("DELETE FROM items WHERE collection_id = ?", (collection_id,))
+                for offset, items in self.client._iter_offset_pages(collection_id):
+                    self._upsert(collection_id, items, offset)
+                    count += len(items)
+                    watermark = max(watermark or "", _watermark(items) or "") or None
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO collections (collection_id, watermark, full_refresh_at) VALUES (?, ?, ?)",
+                    (collection_id, watermark, time.time()),
+                )
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+        REPORT.count("webflow_mirror", "full_refreshes")
+        REPORT.count("webflow_mirror", "items_downloaded", count)
+        print(f"Mirror {collection_id}: full refresh, {count} items")
+
+    def _delta_refresh(self, collection_id, watermark):
+        """
+        Download the items published since `watermark`. Returns False when a full refresh is needed.
+        """
+        changed = []
+        total = None
+        offset = 0
+        while True:
+            response = self.client.get(f"/collections/{collection_id}/items", params={
+                "offset": offset,
+                "limit": WEBFLOW_PAGE_LIMIT,
+                "sortBy": WEBFLOW_MIRROR_SORT_FIELD,
+                "sortOrder": "desc",
+            })
+            if not response.ok:
+                print(f"Mirror {collection_id}: delta refresh failed ({response.status_code} {response.text})")
+                return False
+            data = response.json()
+            items = data.get("items", [])
+            total = data.get("pagination", {}).get("total", total)
+
+            stamps = [item.get(WEBFLOW_MIRROR_SORT_FIELD) or "" for item in items]
+            if stamps != sorted(stamps, reverse=True):
+                print(f"Mirror {collection_id}: items are not sorted by {WEBFLOW_MIRROR_SORT_FIELD}")
+                return False
+
+            # Items updated in the same millisecond as the watermark are fetched again, which is harmless.
+            newer = [item for item, stamp in zip(items, stamps) if not watermark or stamp >= watermark]
+            changed.extend(newer)
+            if len(newer) < len(items) or len(items) < WEBFLOW_PAGE_LIMIT:
+                break
+            offset += WEBFLOW_PAGE_LIMIT
+
+        with self.lock:
+            next_position = self.conn.execute(
+                "SELECT COALESCE(MAX(position), -1) + 1 FROM items WHERE collection_id = ?", (collection_id,)
+            ).fetchone()[0]
+            existing = {
+                item_id: position for item_id, position in self.conn.execute(
+                    "SELECT item_id, position FROM items WHERE collection_id = ?", (collection_id,)
+                )
+            } if changed else {}
+
+            # Changed items keep their place; new items are appended in creation order.
+            updated = [item for item in changed if item["id"] in existing]
+            created = sorted((item for item in changed if item["id"] not in existing), key=lambda i: i.get("createdOn") or "")
+            for item in updated:
+                self._upsert(collection_id, [item], existing[item["id"]])
+            self._upsert(collection_id, created, next_position)
+
+            count = self.conn.execute("SELECT COUNT(*) FROM items WHERE collection_id = ?", (collection_id,)).fetchone()[0]
+            if total is not None and count != total:
+                self.conn.rollback()
+                print(f"Mirror {collection_id}: {count} items locally, {total} in Webflow")
+                return False
+
+            self.conn.execute(
+                "UPDATE collections SET watermark = ? WHERE collection_id = ?",
+                (max(watermark or "", _watermark(changed) or ""), collection_id),
+            )
+            self.conn.commit()
+
+        REPORT.count("webflow_mirror", "delta_refreshes")
+        REPORT.count("webflow_mirror", "items_downloaded", len(changed))
+        print(f"Mirror {collection_id}: {len(updated)} updated, {len(created)} new items")
+        return True
+
+    def _upsert(self, collection_id, items, first_position):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO items"
+            " (collection_id, item_id, position, last_updated, playlist_id, video_id, anime_id, body)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    collection_id, item["id"], first_position + i, item.get("lastUpdated"),
+                    item["fieldData"].get("youtube-playlist-id"), item["fieldData"].get("youtube-video-id"),
+                    item["fieldData"].get("anime-title-3"), json.dumps(item, separators=(",", ":")),
+                )
+                for i, item in enumerate(items)
+            ],
+        )
+
+
+def _watermark(items):
+    return max((item.get(WEBFLOW_MIRROR_SORT_FIELD) or "" for item in items), default=None) or None
@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+
+from googleapiclient.discovery import build
+
+from anibridge.instrumentation import REPORT
+
+# Overrides the YouTube Data API root URL, e.g. to point the scripts at a local stand-in.
+YT_API_ENDPOINT = os.environ.get("YOUTUBE_API_ENDPOINT")
+
+# Send uncached videos().list calls through the API's batch endpoint, up to YT_BATCH_SIZE calls per HTTP request.
+YT_BATCH_REQUESTS = os.environ.get("YT_BATCH_REQUESTS", "false").lower() == "true"
+YT_BATCH_SIZE = int(os.environ.get("YT_BATCH_SIZE", "10"))
+
+_local = threading.local()
+
+
+def get_youtube(api_key):
+    """
+    Return this thread's long-lived YouTube client.
+
+    The client is built once per thread from the static discovery document bundled with
+    google-api-python-client and its HTTP transport (and open connection) is reused for
+    every call. Clients are per thread because httplib2 transports are not thread-safe.
+    """
+    yt = getattr(_local, "youtube", None)
+    if yt is None:
+        started = time.perf_counter()
+        client_options = {"api_endpoint": YT_API_ENDPOINT} if YT_API_ENDPOINT else None
+        yt = build(
+            'youtube', 'v3',
+            developerKey=api_key,
+            static_discovery=True,
+            cache_discovery=False,
+            client_options=client_options,
+        )
+        REPORT.count("youtube", "client_builds")
+        REPORT.count("youtube", "client_build_seconds", time.perf_counter() - started)
+        _local.youtube = yt
+    return yt
+
+
+def timed_execute(endpoint, request, calls=1):
+    """
+    Execute a YouTube request and add its time, call count and quota units to the run report.
+    `calls` is the number of API calls in the request (more than one for batch requests).
+    """
+    started = time.perf_counter()
+    try:
+        return request.execute()
+    finally:
+        REPORT.count("youtube", "requests")
+        REPORT.count("youtube", f"{endpoint}_calls", calls)
+        REPORT.count("youtube", f"{endpoint}_seconds", time.perf_counter() - started)
+        REPORT.count("youtube", "quota_units", calls)  # every list call the scripts make costs 1 unit
+
+
+def fetch_video_batches(yt, id_batches, cache, limiter=None, fresh=False):
+    """
+    Return the videos().list response for each list of video ids in `id_batches`, in order.
+
+    Cached responses are reused unless `fresh` is set. When YT_BATCH_REQUESTS is enabled the remaining calls are
+    grouped into batch HTTP requests instead of one HTTP round-trip per call.
+    """
+    params_list = [{"part": "snippet,contentDetails", "id": ",".join(ids), "hl": "en"} for ids in id_batches]
+    responses = [None if fresh else cache.get("videos", params) for params in params_list]
+    missing = [i for i, response in enumerate(responses) if response is None]
+
+    if YT_BATCH_REQUESTS and len(missing) > 1:
+        for start in range(0, len(missing), YT_BATCH_SIZE):
+            chunk = missing[start:start + YT_BATCH_SIZE]
+            results = {}
+            errors = []
+
+            def callback(request_id, response, exception):
+                if exception is not None:
+                    errors.append(exception)
+                else:
+                    results[int(request_id)] = response
+
+            batch = yt.new_batch_http_request(callback=callback)
+            for i in chunk:
+                if limiter is not None:
+                    limiter.acquire()
+                batch.add(yt.videos().list(**params_list[i]), request_id=str(i))
+            timed_execute("videos", batch, calls=len(chunk))
+
+            if errors:
+                raise errors[0]
+            for i in chunk:
+                responses[i] = results[i]
+                cache.put("videos", params_list[i], results[i])
+    else:
+        for i in missing:
+            if fresh:
+                if limiter is not None:
+                    limiter.acquire()
+                responses[i] = timed_execute("videos", yt.videos().list(**params_list[i]))
+                cache.put("videos", params_list[i], responses[i])
+            else:
+                responses[i] = cache.execute("videos", params_list[i], yt.videos().list(**params_list[i]), limiter)
+
+    return responses
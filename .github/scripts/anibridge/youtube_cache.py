@@ -0,0 +1,136 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from anibridge.instrumentation import REPORT
+from anibridge.youtube import timed_execute
+
+YT_CACHE_PATH = os.environ.get("YT_CACHE_PATH", ".cache/youtube_cache.sqlite")
+YT_CACHE_MAX_BYTES = int(float(os.environ.get("YT_CACHE_MAX_MB", "50")) * 1024 * 1024)
+
+# How long a response stays valid, per YouTube endpoint (seconds).
+# playlistItems must outlive the gap between the add job (02:00) and the sync job (03:00).
+DEFAULT_TTLS = {
+    "playlists": 6 * 3600,
+    "playlistItems": 90 * 60,
+    "videos": 24 * 3600,
+}
+
+
+class YouTubeResponseCache:
+    """
+    SQLite cache of YouTube Data API responses shared by the workflow scripts.
+
+    Responses are keyed by endpoint and request parameters, expire after the
+    endpoint's TTL and the least recently used entries are evicted once the
+    cache grows past `max_bytes`. An empty `path` disables the cache.
+    """
+
+    def __init__(self, path=YT_CACHE_PATH, ttls=None, max_bytes=YT_CACHE_MAX_BYTES):
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = None
+
+        if not path:
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " endpoint TEXT NOT NULL,"
+            " body TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self.conn.commit()
+
+    def execute(self, endpoint, params, request, limiter=None):
+        """
+        Return the cached response for `endpoint` + `params`, or execute `request` and cache it.
+        `limiter` (a TokenBucket) is only charged when the request actually goes to YouTube.
+        """
+        response = self.get(endpoint, params)
+        if response is None:
+            if limiter is not None:
+                limiter.acquire()
+            response = timed_execute(endpoint, request)
+            self.put(endpoint, params, response)
+        return response
+
+    def get(self, endpoint, params):
+        response = self._lookup(endpoint, params)
+        REPORT.count("youtube", "cache_misses" if response is None else "cache_hits")
+        return response
+
+    def _lookup(self, endpoint, params):
+        if self.conn is None:
+            return None
+
+        key = cache_key(endpoint, params)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT body, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+
+            body, created_at = row
+            if now - created_at > self.ttls.get(endpoint, 0):
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.conn.commit()
+                return None
+
+            self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+        return json.loads(body)
+
+    def put(self, endpoint, params, response):
+        if self.conn is None:
+            return
+
+        key = cache_key(endpoint, params)
+        body = json.dumps(response, separators=(",", ":"))
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, body, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint, body, len(body), now, now),
+            )
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Drop expired entries first, then the least recently used ones until under the limit.
+        now = time.time()
+        for endpoint, ttl in self.ttls.items():
+            self.conn.execute("DELETE FROM responses WHERE endpoint = ? AND created_at < ?", (endpoint, now - ttl))
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+        rows = self.conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+
+def cache_key(endpoint, params):
+    params = {name: value for name, value in params.items() if value is not None}
+    # "snippet,contentDetails" and "contentDetails,snippet" are the same request.
+    if "part" in params:
+        params["part"] = ",".join(sorted(params["part"].split(",")))
+    return f"{endpoint}?{json.dumps(params, sort_keys=True, separators=(',', ':'))}"
@@ -0,0 +1,269 @@
+"""
+Offline benchmarks for sync_anime_videos.py and process_anime.py.
+
+Both pipelines run against local Webflow/YouTube stand-in servers and an in-memory
+Google Sheet, over synthetic catalogs of configurable size. Each run happens in a
+fresh subprocess (the scripts keep module-level state) and reports wall time,
+request counts, 429s and simulated YouTube quota use.
+
+    python .github/scripts/benchmarks/run_benchmarks.py --sizes 100,1000 --videos-per-anime 12
+    python .github/scripts/benchmarks/run_benchmarks.py --pipeline sync --sizes 10000 --videos-per-anime 5 --repeat 2
+    python .github/scripts/benchmarks/run_benchmarks.py --pipeline receiver --sizes 1000 --airing-ratio 0.1 --notify 20
+"""
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Same collection ids as the scripts, so the stand-in serves the paths they request.
+ANIMES_COLLECTION_ID = "67fffeccd6749ed6ce46961b"
+ANIME_VIDEOS_COLLECTION_ID = "67ffcb961b77a49b301d4a26"
+
+PIPELINES = {
+    "sync": ("sync_anime_videos", "sync_anime_videos"),
+    "process": ("process_anime", "process"),
+    "receiver": ("sync_receiver", None),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pipeline", choices=["sync", "process", "receiver", "all"], default="all",
+                        help="\"all\" runs sync and process")
+    parser.add_argument("--sizes", default="100,1000", help="comma-separated anime counts")
+    parser.add_argument("--videos-per-anime", type=int, default=12)
+    parser.add_argument("--new-video-ratio", type=float, default=0.05, help="share of each playlist missing in Webflow")
+    parser.add_argument("--removed-video-ratio", type=float, default=0.0,
+                        help="share of anime whose first video was removed from the playlist")
+    parser.add_argument("--airing-ratio", type=float, default=0.0,
+                        help="share of anime that are currently airing (uploaded weekly)")
+    parser.add_argument("--to-add", type=int, default=10, help="rows in the \"to add\" sheet")
+    parser.add_argument("--latency-ms", type=float, default=20, help="simulated latency per request")
+    parser.add_argument("--webflow-rate-limit", type=int, default=120, help="Webflow requests per window")
+    parser.add_argument("--webflow-rate-window", type=float, default=1.0, help="Webflow rate limit window (s)")
+    parser.add_argument("--yt-rps", type=float, default=200, help="YT_REQUESTS_PER_SECOND for the scripts")
+    parser.add_argument("--notify", type=int, default=20,
+                        help="receiver: anime (the last ones, see --airing-ratio) that get a new upload")
+    parser.add_argument("--receiver-delay", type=float, default=0.5,
+                        help="receiver: SYNC_RECEIVER_DELAY_SECONDS for the sync queue")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per child process (warm state/cache)")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    pipelines = ["sync", "process"] if args.pipeline == "all" else [args.pipeline]
+    reports = []
+    for size in [int(s) for s in args.sizes.split(",")]:
+        for pipeline in pipelines:
+            reports.extend(run_in_subprocess(args, pipeline, size))
+
+    for report in reports:
+        print(format_report(report))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+def run_in_subprocess(args, pipeline, size):
+    command = [
+        sys.executable, os.path.abspath(__file__), "--child",
+        "--pipeline", pipeline,
+        "--sizes", str(size),
+        "--videos-per-anime", str(args.videos_per_anime),
+        "--new-video-ratio", str(args.new_video_ratio),
+        "--removed-video-ratio", str(args.removed_video_ratio),
+        "--airing-ratio", str(args.airing_ratio),
+        "--to-add", str(args.to_add),
+        "--latency-ms", str(args.latency_ms),
+        "--webflow-rate-limit", str(args.webflow_rate_limit),
+        "--webflow-rate-window", str(args.webflow_rate_window),
+        "--yt-rps", str(args.yt_rps),
+        "--repeat", str(args.repeat),
+        "--notify", str(args.notify),
+        "--receiver-delay", str(args.receiver_delay),
+    ]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(result.stdout)
+        print(result.stderr, file=sys.stderr)
+        raise SystemExit(f"Benchmark {pipeline} ({size} anime) failed")
+
+    # The child prints the script's own output first and the JSON report on the last line.
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_child(args):
+    sys.path[:0] = [SCRIPTS_DIR, BENCHMARKS_DIR]
+    from standins import FakeSpreadsheet, WebflowStandIn, YouTubeStandIn, build_catalog
+
+    size = int(args.sizes)
+    catalog = build_catalog(
+        ANIMES_COLLECTION_ID, ANIME_VIDEOS_COLLECTION_ID, size, args.videos_per_anime,
+        new_video_ratio=args.new_video_ratio, to_add_count=args.to_add,
+        removed_video_ratio=args.removed_video_ratio, airing_ratio=args.airing_ratio,
+    )
+    latency = args.latency_ms / 1000
+    webflow = WebflowStandIn(
+        catalog["collections"], rate_limit=args.webflow_rate_limit, rate_window=args.webflow_rate_window,
+        latency=latency,
+    ).start()
+    youtube = YouTubeStandIn(catalog["playlists"], latency=latency).start()
+    spreadsheet = FakeSpreadsheet(catalog["sheets"])
+    work_dir = tempfile.mkdtemp(prefix="anibridge-bench-")
+
+    # The shared modules read endpoints and tuning knobs at import, so they must be in place first.
+    os.environ.update({
+        "WEBFLOW_API_SITE_TOKEN": "benchmark",
+        "WEBFLOW_API_BASE_URL": f"{webflow.url}/v2",
+        "YOUTUBE_API_KEY": "benchmark",
+        "YOUTUBE_API_ENDPOINT": f"{youtube.url}/",
+        "YT_REQUESTS_PER_SECOND": str(args.yt_rps),
+        "YT_REQUESTS_BURST": str(max(1, int(args.yt_rps))),
+        "YT_CACHE_PATH": os.path.join(work_dir, "youtube_cache.sqlite"),
+        "PLAYLIST_STATE_PATH": os.path.join(work_dir, "playlist_state.json"),
+        "EPISODES_EXPORT_DIR": os.path.join(work_dir, "episodes"),
+        "WEBFLOW_MIRROR_PATH": os.path.join(work_dir, "webflow_mirror.sqlite"),
+        "SHEET_INDEX_PATH": os.path.join(work_dir, "sheet_index.json"),
+    })
+
+    module_name, entry_point = PIPELINES[args.pipeline]
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    import_seconds = time.perf_counter() - started
+    module.CTX.override("spreadsheet", spreadsheet)
+    from anibridge.instrumentation import REPORT
+
+    if args.pipeline == "receiver":
+        report = run_receiver(module, webflow, youtube, catalog, args)
+        webflow.stop()
+        youtube.stop()
+        print(json.dumps([{**report, "anime": size, "videos": size * args.videos_per_anime,
+                           "import_seconds": round(import_seconds, 3), "sheets_calls": {}}]))
+        return
+
+    reports = []
+    for run in range(1, args.repeat + 1):
+        webflow.requests.clear()
+        youtube.requests.clear()
+        youtube.quota = 0
+        spreadsheet.calls.clear()
+
+        started = time.perf_counter()
+        getattr(module, entry_point)()
+        wall_seconds = time.perf_counter() - started
+
+        reports.append({
+            "pipeline": args.pipeline,
+            "run": run,
+            "anime": size,
+            "videos": size * args.videos_per_anime,
+            "import_seconds": round(import_seconds, 3),
+            "wall_seconds": round(wall_seconds, 3),
+            "webflow_requests": dict(webflow.requests),
+            "youtube_requests": dict(youtube.requests),
+            "youtube_quota_units": youtube.quota,
+            "sheets_calls": dict(spreadsheet.calls),
+            # The script's own run report, to compare its counters with what the stand-ins saw.
+            "run_report": REPORT.to_dict(),
+        })
+
+        # process_anime keeps per-run lists at module level, so only its first run is meaningful.
+        if args.pipeline == "process":
+            break
+
+    webflow.stop()
+    youtube.stop()
+    print(json.dumps(reports))
+
+
+def run_receiver(module, webflow, youtube, catalog, args):
+    """
+    Sync everything once, then upload a new video to the last `--notify` playlists and send
+    the receiver the notifications about them: three YouTube pushes per upload (the hub
+    repeats itself) and a Webflow webhook for every other anime. Reports the syncs the
+    queue ran and the time until every upload was in Webflow.
+    """
+    from anibridge.sync_queue import SyncQueue
+    from standins import webflow_item_event, youtube_channel_id, youtube_feed_notification
+    import sync_anime_videos
+
+    sync_anime_videos.sync_anime_videos()
+    webflow.requests.clear()
+    youtube.requests.clear()
+    youtube.quota = 0
+
+    queue = SyncQueue(module.sync_anime, delay=args.receiver_delay).start()
+    server = module.make_server(queue, "127.0.0.1", 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def post(path, data):
+        urllib.request.urlopen(urllib.request.Request(f"{url}{path}", data=data, method="POST")).read()
+
+    targets = catalog["collections"][ANIMES_COLLECTION_ID][-args.notify:]
+    started = time.perf_counter()
+    notifications = 0
+    for n, anime in enumerate(targets):
+        playlist_id = anime["fieldData"]["youtube-playlist-id"]
+        video = {
+            "id": f"{playlist_id}new",
+            "title": f"{anime['fieldData']['name']} New Episode",
+            "publishedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        youtube.add_video(playlist_id, video)
+        for _ in range(3):
+            post("/youtube", youtube_feed_notification(youtube_channel_id(playlist_id), video))
+            notifications += 1
+        if n % 2 == 0:
+            post("/webflow", json.dumps(webflow_item_event(ANIMES_COLLECTION_ID, anime)).encode())
+            notifications += 1
+
+    queue.join()
+    wall_seconds = time.perf_counter() - started
+    server.shutdown()
+    queue.stop()
+
+    return {
+        "pipeline": "receiver",
+        "run": 1,
+        "wall_seconds": round(wall_seconds, 3),
+        "notifications": notifications,
+        "queue": dict(queue.stats),
+        "webflow_requests": dict(webflow.requests),
+        "youtube_requests": dict(youtube.requests),
+        "youtube_quota_units": youtube.quota,
+    }
+
+
+def format_report(report):
+    webflow = report["webflow_requests"]
+    youtube = report["youtube_requests"]
+    return (
+        f"{report['pipeline']:<8} run {report['run']}  {report['anime']:>6} anime {report['videos']:>7} videos  "
+        f"wall {report['wall_seconds']:>8.2f}s  "
+        f"webflow {sum(v for k, v in webflow.items() if not k.startswith('items_') and k != '429'):>6} req "
+        f"({webflow.get('429', 0)} x 429, {webflow.get('items_created', 0)} created, "
+        f"{webflow.get('items_updated', 0)} updated, {webflow.get('items_deleted', 0)} deleted)  "
+        f"youtube {sum(youtube.values()) - youtube.get('not_modified', 0):>6} req "
+        f"({report['youtube_quota_units']} units, {youtube.get('not_modified', 0)} not modified)  "
+        f"sheets {sum(report['sheets_calls'].values())} calls"
+        + (f"  {report['notifications']} notifications -> {report['queue']}" if "queue" in report else "")
+    )
+
+
+if __name__ == "__main__":
+    main()
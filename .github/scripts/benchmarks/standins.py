@@ -0,0 +1,506 @@
+"""
+Local stand-ins for the services used by the workflow scripts, for offline benchmarks.
+
+- WebflowStandIn: Webflow v2 collection items API (list/create/update/delete/publish)
+  with a fixed request window that answers 429 + Retry-After when exceeded.
+- YouTubeStandIn: YouTube Data API v3 playlists/playlistItems/videos with 50-item
+  pagination, ETags and If-None-Match support.
+- FakeSpreadsheet: in-memory gspread spreadsheet/worksheets.
+- webflow_item_event / youtube_feed_notification: the notifications Webflow webhooks and
+  YouTube's PubSubHubbub hub send, for the sync receiver.
+"""
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+# YouTube Data API quota cost of the calls the scripts make.
+YOUTUBE_QUOTA_COST = {"playlists": 1, "playlistItems": 1, "videos": 1}
+
+
+class StandInServer:
+    """
+    Threaded local HTTP server; subclasses implement `handle(method, path, query, body)`
+    and return `(status, payload, headers)`.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = Counter()
+        self.lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_PATCH(self):
+                self._dispatch("PATCH")
+
+            def do_DELETE(self):
+                self._dispatch("DELETE")
+
+            def _dispatch(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                url = urlparse(self.path)
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                body = json.loads(raw) if raw else None
+
+                if server.latency:
+                    time.sleep(server.latency)
+
+                status, payload, headers = server.handle(method, url.path, query, body, self.headers)
+                data = json.dumps(payload).encode() if payload is not None else b""
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, str(value))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def count(self, name):
+        with self.lock:
+            self.requests[name] += 1
+
+    def handle(self, method, path, query, body, headers):
+        raise NotImplementedError
+
+
+class WebflowStandIn(StandInServer):
+    def __init__(self, collections, rate_limit=120, rate_window=1.0, latency=0.0):
+        super().__init__(latency)
+        self.collections = collections  # collection id -> list of items
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.window_started = time.monotonic()
+        self.window_count = 0
+        self.next_id = 0
+        self.published = Counter()
+
+    def handle(self, method, path, query, body, headers):
+        limited, rate_headers = self._take_rate_slot()
+        if limited:
+            self.count("429")
+            return 429, {"message": "Too many requests"}, rate_headers
+
+        parts = path.strip("/").split("/")  # v2 / collections / <id> / items [/ publish | live]
+        if len(parts) < 4 or parts[1] != "collections" or parts[3] != "items":
+            return 404, {"message": "Not found"}, rate_headers
+
+        collection_id = parts[2]
+        items = self.collections.setdefault(collection_id, [])
+        action = parts[4] if len(parts) > 4 else None
+
+        with self.lock:
+            if method == "GET" and action is None:
+                self.requests["list"] += 1
+                offset = int(query.get("offset", 0))
+                limit = min(int(query.get("limit", 100)), 100)
+                ordered = items
+                # Like the real API, only these sort fields are accepted.
+                if query.get("sortBy") and query["sortBy"] not in ("lastPublished", "name", "slug"):
+                    return 400, {"message": f"Validation Error: invalid sortBy {query['sortBy']}"}, rate_headers
+                if query.get("sortBy"):
+                    key = query["sortBy"]
+                    ordered = sorted(
+                        items, key=lambda i: i.get(key) or i["fieldData"].get(key) or "",
+                        reverse=query.get("sortOrder") == "desc",
+                    )
+                page = ordered[offset:offset + limit]
+                return 200, {
+                    "items": page,
+                    "pagination": {"limit": limit, "offset": offset, "total": len(items)},
+                }, rate_headers
+
+            if method == "POST" and action is None:
+                self.requests["create"] += 1
+                new_items = [self._new_item(item) for item in (body.get("items") or [body])]
+                items.extend(new_items)
+                self.requests["items_created"] += len(new_items)
+                return 202, ({"items": new_items} if "items" in body else new_items[0]), rate_headers
+
+            if method == "POST" and action == "publish":
+                self.requests["publish"] += 1
+                if len(body.get("itemIds", [])) > 100:
+                    return 400, {"message": "Validation Error: itemIds can have at most 100 items"}, rate_headers
+                self.published[collection_id] += len(body.get("itemIds", []))
+                ids = set(body.get("itemIds", []))
+                now = _now()
+                for item in items:
+                    if item["id"] in ids:
+                        item["lastPublished"] = now
+                return 202, {"publishedItemIds": body.get("itemIds", [])}, rate_headers
+
+            if method == "PATCH" and action is None:
+                self.requests["update"] += 1
+                by_id = {item["id"]: item for item in items}
+                updated = []
+                for change in body.get("items", []):
+                    item = by_id.get(change.get("id"))
+                    if item is None:
+                        continue
+                    item["fieldData"].update(change.get("fieldData", {}))
+                    for flag in ("isArchived", "isDraft"):
+                        if flag in change:
+                            item[flag] = change[flag]
+                    item["lastUpdated"] = _now()
+                    updated.append(item)
+                self.requests["items_updated"] += len(updated)
+                return 200, {"items": updated}, rate_headers
+
+            if method == "DELETE" and action == "live":
+                self.requests["unpublish"] += 1
+                self.published[collection_id] -= len((body or {}).get("items", []))
+                return 204, None, rate_headers
+
+            if method == "DELETE" and action is None:
+                self.requests["delete"] += 1
+                ids = {item.get("id") for item in (body or {}).get("items", [])}
+                items[:] = [item for item in items if item["id"] not in ids]
+                self.requests["items_deleted"] += len(ids)
+                return 204, None, rate_headers
+
+        return 405, {"message": "Method not allowed"}, rate_headers
+
+    def _take_rate_slot(self):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_started >= self.rate_window:
+                self.window_started = now
+                self.window_count = 0
+
+            reset_after = self.rate_window - (now - self.window_started)
+            headers = {"X-RateLimit-Limit": self.rate_limit, "X-RateLimit-Reset": f"{reset_after:.3f}"}
+            if self.window_count >= self.rate_limit:
+                headers["X-RateLimit-Remaining"] = 0
+                headers["Retry-After"] = max(1, math.ceil(reset_after))
+                return True, headers
+
+            self.window_count += 1
+            headers["X-RateLimit-Remaining"] = self.rate_limit - self.window_count
+            return False, headers
+
+    def _new_item(self, item):
+        self.next_id += 1
+        now = _now()
+        return {
+            "id": f"new{self.next_id:08d}",
+            "isArchived": item.get("isArchived", False),
+            "isDraft": item.get("isDraft", False),
+            "createdOn": now,
+            "lastUpdated": now,
+            "lastPublished": None,
+            "fieldData": dict(item.get("fieldData", {})),
+        }
+
+
+class YouTubeStandIn(StandInServer):
+    def __init__(self, playlists, latency=0.0):
+        super().__init__(latency)
+        self.playlists = playlists  # playlist id -> list of video dicts (id, title, publishedAt)
+        self.videos = {video["id"]: video for videos in playlists.values() for video in videos}
+        self.quota = 0
+
+    def handle(self, method, path, query, body, headers):
+        endpoint = path.rstrip("/").split("/")[-1]
+        if endpoint not in YOUTUBE_QUOTA_COST:
+            return 404, {"error": {"code": 404, "message": "Not found"}}, None
+
+        with self.lock:
+            self.requests[endpoint] += 1
+            self.quota += YOUTUBE_QUOTA_COST[endpoint]
+
+        if endpoint == "playlists":
+            items = [
+                {"id": pid, "snippet": {"title": pid, "description": f"Description of {pid}"}}
+                for pid in query.get("id", "").split(",") if pid in self.playlists
+            ]
+            return 200, {"kind": "youtube#playlistListResponse", "items": items}, None
+
+        if endpoint == "playlistItems":
+            videos = self.playlists.get(query.get("playlistId"), [])
+            offset = int(query.get("pageToken") or 0)
+            limit = int(query.get("maxResults", 5))
+            page = videos[offset:offset + limit]
+            response = {
+                "kind": "youtube#playlistItemListResponse",
+                "items": [
+                    {
+                        "snippet": {
+                            "title": video["title"],
+                            "position": offset + i,
+                            "channelId": youtube_channel_id(query.get("playlistId")),
+                        },
+                        "contentDetails": {"videoId": video["id"]},
+                    }
+                    for i, video in enumerate(page)
+                ],
+                "pageInfo": {"totalResults": len(videos), "resultsPerPage": limit},
+            }
+            if offset + limit < len(videos):
+                response["nextPageToken"] = str(offset + limit)
+            response["etag"] = hashlib.md5(json.dumps(response, sort_keys=True).encode()).hexdigest()
+
+            if headers.get("If-None-Match") == response["etag"]:
+                with self.lock:
+                    self.requests["not_modified"] += 1
+                return 304, None, None
+            return 200, response, None
+
+        items = [
+            {
+                "id": vid,
+                "snippet": {
+                    "title": self.videos[vid]["title"],
+                    "localized": {"title": self.videos[vid]["title"]},
+                    "publishedAt": self.videos[vid]["publishedAt"],
+                },
+                "contentDetails": {"duration": "PT24M"},
+            }
+            for vid in query.get("id", "").split(",") if vid in self.videos
+        ]
+        return 200, {"kind": "youtube#videoListResponse", "items": items}, None
+
+    def add_video(self, playlist_id, video):
+        # Simulate an upload: `video` is a dict like the catalog's (id, title, publishedAt).
+        with self.lock:
+            self.playlists[playlist_id].append(video)
+            self.videos[video["id"]] = video
+
+
+def youtube_channel_id(playlist_id):
+    # Every synthetic playlist belongs to its own channel.
+    return f"UC{playlist_id}"
+
+
+def webflow_item_event(collection_id, item, trigger_type="collection_item_changed"):
+    return {
+        "triggerType": trigger_type,
+        "payload": {**item, "collectionId": collection_id},
+    }
+
+
+def youtube_feed_notification(channel_id, video):
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">
+  <link rel="hub" href="https://pubsubhubbub.appspot.com"/>
+  <link rel="self" href="https://www.youtube.com/xml/feeds/videos.xml?channel_id={channel_id}"/>
+  <title>YouTube video feed</title>
+  <entry>
+    <id>yt:video:{video["id"]}</id>
+    <yt:videoId>{video["id"]}</yt:videoId>
+    <yt:channelId>{channel_id}</yt:channelId>
+    <title>{escape(video["title"])}</title>
+    <published>{video["publishedAt"]}</published>
+    <updated>{_now()}</updated>
+  </entry>
+</feed>
+""".encode()
+
+
+class FakeWorksheet:
+    def __init__(self, name, header, rows, calls):
+        self.title = name
+        self.header = header
+        self.rows = [list(row) for row in rows]
+        self.calls = calls
+
+    def get_all_records(self):
+        self.calls["get_all_records"] += 1
+        return [dict(zip(self.header, row)) for row in self.rows if any(row)]
+
+    def get_values(self, range_name=None):
+        self.calls["get_values"] += 1
+        return [self.header] + [row for row in self.rows]
+
+    def batch_get(self, ranges):
+        # Only whole rows ("1:1") and ranges of whole rows ("A5:ZZ", "A2:ZZ9") are supported.
+        self.calls["batch_get"] += 1
+        grid = [self.header] + self.rows
+        results = []
+        for range_name in ranges:
+            first, last = range_name.split(":")
+            start = int(first.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+            last = last.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+            end = int(last) if last else len(grid)
+            rows = [_trim_cells(row) for row in grid[start - 1:end]]
+            while rows and not rows[-1]:
+                rows.pop()
+            results.append(rows)
+        return results
+
+    def append_row(self, row):
+        self.calls["append_row"] += 1
+        self.rows.append(list(row))
+
+    def append_rows(self, rows):
+        self.calls["append_rows"] += 1
+        self.rows.extend(list(row) for row in rows)
+
+    def batch_clear(self, ranges):
+        self.calls["batch_clear"] += 1
+        for range_name in ranges:
+            row_idx = int(range_name.split(":")[0])
+            if 2 <= row_idx < len(self.rows) + 2:
+                self.rows[row_idx - 2] = [""] * len(self.header)
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheets):
+        self.calls = Counter()
+        self.worksheets = {
+            name: FakeWorksheet(name, header, rows, self.calls) for name, (header, rows) in worksheets.items()
+        }
+
+    def worksheet(self, name):
+        self.calls["worksheet"] += 1
+        return self.worksheets[name]
+
+
+# ----------------------------
+# Synthetic catalogs
+# ----------------------------
+def build_catalog(animes_collection_id, anime_videos_collection_id, anime_count, videos_per_anime,
+                  new_video_ratio=0.05, to_add_count=10, removed_video_ratio=0.0, airing_ratio=0.0):
+    """
+    Return a synthetic catalog: Webflow collections, YouTube playlists and sheet rows.
+
+    The last `new_video_ratio` of each playlist is missing from Webflow, so the sync run
+    has videos to create. `to_add_count` extra playlists only exist on YouTube and in
+    the "to add" sheet. For the first `removed_video_ratio` of the anime, the first video
+    was removed from the playlist but is still in Webflow, so the sync run has one video
+    to remove and the episode order of the others to update. The last `airing_ratio` of
+    the anime are currently airing: one video a week, the latest uploaded yesterday.
+    Every other playlist finished airing years ago.
+    """
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    playlists = {}
+    animes = []
+    anime_videos = []
+    existing_per_anime = videos_per_anime - math.ceil(videos_per_anime * new_video_ratio)
+    removed_count = int(anime_count * removed_video_ratio)
+    airing_from = anime_count - int(anime_count * airing_ratio)
+    airing_start = datetime.now(timezone.utc) - timedelta(days=1 + 7 * (videos_per_anime - 1))
+
+    for i in range(anime_count + to_add_count):
+        playlist_id = f"PL{i:06d}"
+        playlists[playlist_id] = [
+            {
+                "id": f"v{i:06d}x{j:04d}",
+                "title": f"Anime {i} Episode {j + 1}",
+                "publishedAt": (
+                    airing_start + timedelta(days=7 * j) if airing_from <= i < anime_count
+                    else start + timedelta(days=i % 365, hours=j)
+                ).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }
+            for j in range(videos_per_anime)
+        ]
+        if i >= anime_count:
+            continue
+
+        anime_id = f"anime{i:06d}"
+        animes.append({
+            "id": anime_id,
+            "isArchived": False,
+            "isDraft": False,
+            "lastUpdated": _stamp(start, i * (videos_per_anime + 1)),
+            "lastPublished": _stamp(start, i * (videos_per_anime + 1)),
+            "fieldData": {
+                "name": f"Anime {i}",
+                "slug": f"anime-{i}",
+                "youtube-playlist-id": playlist_id,
+                "thumbnail": {"url": f"https://example.com/{i}.jpg"},
+                "release-date": (start + timedelta(days=i % 1500)).strftime("%Y-%m-%dT00:00:00.000Z"),
+                "genres": "Action",
+                "description": f"Synthetic anime number {i}.",
+            },
+        })
+        for j, video in enumerate(playlists[playlist_id][:existing_per_anime]):
+            anime_videos.append({
+                "id": f"item{i:06d}x{j:04d}",
+                "isArchived": False,
+                "isDraft": False,
+                "lastUpdated": _stamp(start, i * (videos_per_anime + 1) + j + 1),
+                "lastPublished": _stamp(start, i * (videos_per_anime + 1) + j + 1),
+                "fieldData": {
+                    "name": video["title"],
+                    "slug": f"anime-{i}-episode-{j + 1}",
+                    "youtube-video-id": video["id"],
+                    "youtube-video": f"https://www.youtube.com/watch?v={video['id']}",
+                    "anime-title-3": anime_id,
+                    "episode-order": j + 1,
+                    "youtube-video-publish-date": video["publishedAt"],
+                },
+            })
+        if i < removed_count:
+            del playlists[playlist_id][0]
+
+    sheet_header = ["anime_title", "youtube_playlist_id", "thumbnail_image_url"]
+    to_add_rows = [
+        [f"Anime {i}", f"PL{i:06d}", f"https://example.com/{i}.jpg"]
+        for i in range(anime_count, anime_count + to_add_count)
+    ]
+    added_rows = [
+        [anime["fieldData"]["name"], anime["fieldData"]["youtube-playlist-id"], "", "2024-01-01T00:00:00.000Z"]
+        for anime in animes
+    ]
+
+    return {
+        "collections": {animes_collection_id: animes, anime_videos_collection_id: anime_videos},
+        "playlists": playlists,
+        "sheets": {
+            "to add": (sheet_header, to_add_rows),
+            "added": (sheet_header + ["added_at"], added_rows),
+            "has issues": (sheet_header + ["date", "issue"], []),
+        },
+    }
+
+
+def _trim_cells(row):
+    row = list(row)
+    while row and row[-1] in ("", None):
+        row.pop()
+    return row
+
+
+def _stamp(start, seconds):
+    return (start + timedelta(seconds=seconds)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
@@ -0,0 +1,124 @@
+import argparse
+import os
+
+from anibridge.context import Context
+from anibridge.export import write_json_variants, write_shards
+from anibridge.instrumentation import REPORT
+from anibridge.search import build_search_index
+
+# Exported collections: output file + (JSON key, Webflow field slug) pairs.
+# Fields missing from an item are left out of its record, like the previous exports did.
+# Exports with "shards" are also split into an index, per-slug records and list pages.
+# Exports with "search" also get a prebuilt search index over the given record fields.
+EXPORTS = {
+    "animes": {
+        "collection_id": "67fffeccd6749ed6ce46961b",
+        "output": "animes.json",
+        "fields": [
+            ("name", "name"),
+            ("slug", "slug"),
+            ("thumbnail", "thumbnail"),
+            ("releaseDate", "release-date"),
+            ("genres", "genres"),
+            ("description", "description"),
+            ("youtubePlaylistId", "youtube-playlist-id"),
+            ("trailerYoutubeVideoId", "trailer-youtube-video-id"),
+        ],
+        "shards": {
+            "directory": "animes",
+            "index_record": lambda record: {
+                "name": record.get("name"),
+                "slug": record["slug"],
+                "thumbnail": (record.get("thumbnail") or {}).get("url"),
+                "releaseDate": record.get("releaseDate"),
+                "genres": record.get("genres"),
+            },
+        },
+        "search": {
+            "output": "animes.search.json",
+            "fields": ["name", "genres"],
+        },
+    },
+    "affiliate_products": {
+        "collection_id": "68933f50454777c4b8afb247",
+        "output": "affiliate_products.json",
+        "fields": [
+            ("name", "name"),
+            ("slug", "slug"),
+            ("price", "price"),
+            ("affiliateLink", "affiliate-link"),
+            ("description", "description"),
+            ("tempImage", "temp-image"),
+            ("affiliatePartner", "affiliate-partner"),
+        ],
+        "search": {
+            "output": "affiliate_products.search.json",
+            "fields": ["name", "description", "affiliatePartner"],
+        },
+    },
+}
+
+# Directory the JSON files are written to (the repo root, served by GitHub Pages).
+EXPORT_DIR = os.environ.get("EXPORT_DIR", ".")
+
+# Number of index entries per list page of a sharded export.
+EXPORT_PAGE_SIZE = int(os.environ.get("EXPORT_PAGE_SIZE", "48"))
+
+# Secrets and the Webflow client are only loaded when first used.
+CTX = Context()
+
+
+def export_collection(name):
+    REPORT.start(f"export_{name}")
+    export = EXPORTS[name]
+
+    with REPORT.span("fetch_items"):
+        items = CTX.webflow_items.fetch_all_items(export["collection_id"])
+    REPORT.items("items", len(items))
+    print(f"{name}: {len(items)} items")
+
+    records = [simplify(item, export["fields"]) for item in items]
+
+    with REPORT.span("write"):
+        written = write_json_variants(os.path.join(EXPORT_DIR, export["output"]), records)
+        removed = []
+
+        shards = export.get("shards")
+        if shards:
+            shards_written, removed = write_shards(
+                os.path.join(EXPORT_DIR, shards["directory"]), records, shards["index_record"], EXPORT_PAGE_SIZE,
+            )
+            written += shards_written
+
+        search = export.get("search")
+        if search:
+            search_index = build_search_index(records, search["fields"])
+            written += write_json_variants(os.path.join(EXPORT_DIR, search["output"]), search_index, pretty=False)
+
+    REPORT.items("files_written", len(written))
+    if written or removed:
+        print(f"Updated {len(written)} files, removed {len(removed)} files")
+        for path in written + removed:
+            print(f"  {path}")
+    else:
+        print(f"{export['output']} unchanged")
+
+    REPORT.emit()
+
+
+def simplify(item, fields):
+    field_data = item["fieldData"]
+    return {key: field_data[slug] for key, slug in fields if slug in field_data}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Webflow CMS collections to static JSON files.")
+    parser.add_argument("exports", nargs="+", choices=sorted(EXPORTS))
+    args = parser.parse_args()
+
+    for name in args.exports:
+        export_collection(name)
+
+
+if __name__ == "__main__":
+    main()
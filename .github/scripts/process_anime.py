@@ -1,121 +1,178 @@
 import os
-import json
-import gspread
-import requests
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 import unicodedata
 import re
-import time
 
-# Set this secret in GitHub.
-WEBFLOW_API_SITE_TOKEN = os.environ["WEBFLOW_API_SITE_TOKEN"]
+from anibridge.context import Context
+from anibridge.instrumentation import REPORT
+from anibridge.playlists import episode_order, fetch_playlist_videos
+from anibridge.sheet_index import normalize_title
+from anibridge.webflow import PublishQueue
+from anibridge.youtube import get_youtube
+
 ANIMES_COLLECTION_ID = "67fffeccd6749ed6ce46961b"
 ANIME_VIDEOS_COLLECTION_ID = "67ffcb961b77a49b301d4a26"
-ANIMES_CREATE_COLLECTION_ITEMS_URL = f"https://api.webflow.com/v2/collections/{ANIMES_COLLECTION_ID}/items"
-ANIME_VIDEOS_CREATE_COLLECTION_ITEMS_URL = f"https://api.webflow.com/v2/collections/{ANIME_VIDEOS_COLLECTION_ID}/items"
-
-# Create Webflow collection item.
-WEBFLOW_API_HEADERS = {
-    "Authorization": f"Bearer {WEBFLOW_API_SITE_TOKEN}",
-    "Content-Type": "application/json"
-}
-
-YT_API_KEY = os.environ['YOUTUBE_API_KEY']
-
-# Authenticate Google Sheets.
-CREDS_JSON = os.environ['GOOGLE_SERVICE_ACCOUNT_JSON']
-CREDS_DICT = json.loads(CREDS_JSON)
-CREDS = Credentials.from_service_account_info(CREDS_DICT, scopes=["https://www.googleapis.com/auth/spreadsheets"])
-GC = gspread.authorize(CREDS)
-SHEET = GC.open_by_key(os.environ['GOOGLE_SHEET_ID'])
-
-TO_ADD = SHEET.worksheet("to add").get_all_records()
-ADDED = SHEET.worksheet("added").get_all_records()
 
-to_add_sheet = SHEET.worksheet("to add")
-added_sheet = SHEET.worksheet("added")
-has_issues_sheet = SHEET.worksheet("has issues")
+# Number of "to add" rows ingested in parallel.
+PROCESS_WORKERS = int(os.environ.get("PROCESS_WORKERS", "4"))
 
-added_titles = set(row['anime_title'] for row in ADDED)
-to_add_titles = set()
-added_playlist_ids = set(row['youtube_playlist_id'] for row in ADDED)
-to_add_playlist_ids = set()
+# Secrets, the Webflow client, the YouTube cache and the spreadsheet are only loaded when first used.
+CTX = Context()
 
 issues = []
 rows_to_clear = []
+added_rows = []
 
 CURRENT_DATETIME = datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
 
 def process():
-    animes_to_publish = []
-    anime_videos_to_publish = []
+    REPORT.start("process_anime")
+
+    # Of the "added" sheet, only the rows appended since the last run are read (see SheetIndex).
+    sheet_index = CTX.sheet_index
+    with REPORT.span("read_sheets"):
+        to_add = sheet_index.read_to_add(CTX.worksheet("to add"))
+        if not to_add:
+            print("Nothing to add")
+            REPORT.emit()
+            return
+
+        # Only read the "added" sheet when there is something to check against it.
+        sheet_index.refresh_added(CTX.worksheet("added"))
+    REPORT.items("rows", len(to_add))
+    added_playlist_ids = sheet_index.added_playlist_ids
+    to_add_playlist_ids = set()
+
+    # Created items are published in chunks while the remaining rows are still being ingested.
+    # Animes are published before the Anime Videos items that reference them.
+    animes_publisher = PublishQueue(CTX.webflow, ANIMES_COLLECTION_ID)
+    videos_publisher = PublishQueue(CTX.webflow, ANIME_VIDEOS_COLLECTION_ID, requires=animes_publisher)
+    rows_by_item_id = {}  # created item id -> (title, playlist_id, thumb_url), to report publish errors
 
-    # start=2 because row 1 is header.
-    for idx, row in enumerate(TO_ADD, start=2):
-        title = row['anime_title']
-        playlist_id = row['youtube_playlist_id']
-        thumb_url = row['thumbnail_image_url']
+    try:
+        # ----------------------------
+        # Duplicate checks, done up front so workers only get unique playlists.
+        # ----------------------------
+        rows_to_ingest = []
+
+        for idx, row in to_add:
+            title = row['anime_title']
+            playlist_id = row['youtube_playlist_id']
+            thumb_url = row['thumbnail_image_url']
+
+            if playlist_id in added_playlist_ids:
+                issues.append([title, playlist_id, thumb_url, CURRENT_DATETIME, "Duplicate youtube_playlist_id in \"added\" sheet"])
+                rows_to_clear.append(idx)
+                continue
 
-        if playlist_id in added_playlist_ids:
-            issues.append([title, playlist_id, thumb_url, CURRENT_DATETIME, "Duplicate youtube_playlist_id in \"added\" sheet"])
-            rows_to_clear.append(idx)
-            continue
+            if playlist_id in to_add_playlist_ids:
+                issues.append([title, playlist_id, thumb_url, CURRENT_DATETIME, "Duplicate youtube_playlist_id in \"to add\" sheet"])
+                rows_to_clear.append(idx)
+                continue
 
-        if playlist_id in to_add_playlist_ids:
-            issues.append([title, playlist_id, thumb_url, CURRENT_DATETIME, "Duplicate youtube_playlist_id in \"to add\" sheet"])
-            rows_to_clear.append(idx)
-            continue
+            if normalize_title(title) in sheet_index.added_titles:
+                print(f"{title}: an anime with this title was already added, adding playlist {playlist_id} anyway")
+
+            to_add_playlist_ids.add(playlist_id)
+            rows_to_ingest.append((idx, title, playlist_id, thumb_url))
+
+        # ----------------------------
+        # Ingest rows in parallel. Results are merged back in sheet order.
+        # ----------------------------
+        with REPORT.span("ingest"), ThreadPoolExecutor(max_workers=PROCESS_WORKERS) as executor:
+            results = executor.map(lambda row: ingest_row(*row), rows_to_ingest)
+
+            for (idx, title, playlist_id, thumb_url), (anime_id, anime_videos_ids, error) in zip(rows_to_ingest, results):
+                if error:
+                    issues.append([title, playlist_id, thumb_url, CURRENT_DATETIME, f"Failed to process anime: {error}"])
+                    rows_to_clear.append(idx)
+                    continue  # Skip publishing this anime/videos entirely
+
+                for item_id in [anime_id, *anime_videos_ids]:
+                    rows_by_item_id[item_id] = (title, playlist_id, thumb_url)
+                animes_publisher.add([anime_id])
+                videos_publisher.add(anime_videos_ids)
+                REPORT.items("animes_created")
+                REPORT.items("videos_created", len(anime_videos_ids))
+
+                # Record the addition in the "added" sheet.
+                added_rows.append([title, playlist_id, thumb_url, CURRENT_DATETIME])
+                rows_to_clear.append(idx)
+    finally:
+        try:
+            # Publish what was created even if the loop crashed, since those rows are done.
+            animes_publisher.flush()
+            videos_publisher.flush()
 
-        to_add_playlist_ids.add(playlist_id)
+            for item_id, reason in animes_publisher.failed + videos_publisher.failed:
+                title, playlist_id, thumb_url = rows_by_item_id[item_id]
+                issues.append([title, playlist_id, thumb_url, CURRENT_DATETIME, f"Failed to publish item {item_id}: {reason}"])
+        finally:
+            # Write sheet changes even if the loop crashed, so created animes are not re-added next run.
+            with REPORT.span("flush_sheets"):
+                flush_sheet_changes()
+            sheet_index.save()
 
-        try:
-            # Create new item in the Animes collection.
-            playlist_videos, anime_id = create_animes_collection_items(title, playlist_id, thumb_url, idx)
+    REPORT.emit()
+
+    if animes_publisher.failed or videos_publisher.failed:
+        raise Exception(f"{len(animes_publisher.failed) + len(videos_publisher.failed)} items failed to publish")
+
+
+def ingest_row(idx, title, playlist_id, thumb_url):
+    """
+    Create the Animes item and its Anime Videos items for one "to add" row.
+    Runs in a worker thread and returns (anime_id, anime_videos_ids, error).
+    """
+    try:
+        # Create new item in the Animes collection.
+        playlist_videos, anime_id = create_animes_collection_items(title, playlist_id, thumb_url, idx)
+
+        if not anime_id:
+            raise Exception("Anime creation failed (no ID returned)")
 
-            if not anime_id:
-                raise Exception("Anime creation failed (no ID returned)")
+        anime_videos_ids = create_anime_videos_collection_items(anime_id, playlist_videos, title, playlist_id, thumb_url)
 
-            anime_videos_ids = create_anime_videos_collection_items(anime_id, playlist_videos, title, playlist_id, thumb_url)
+        if not anime_videos_ids:
+            raise Exception("No videos created for this anime")
 
-            if not anime_videos_ids:
-                raise Exception("No videos created for this anime")
+        return anime_id, anime_videos_ids, None
 
-            animes_to_publish.append(anime_id)
-            anime_videos_to_publish.extend(anime_videos_ids)
+    except Exception as e:
+        return None, [], e
 
-            # Record the addition in the "added" sheet.
-            added_sheet.append_row([title, playlist_id, thumb_url, CURRENT_DATETIME])
-            rows_to_clear.append(idx)
 
-        except Exception as e:
-            issues.append([title, playlist_id, thumb_url, CURRENT_DATETIME, f"Failed to process anime: {e}"])
-            rows_to_clear.append(idx)
-            continue  # Skip publishing this anime/videos entirely
+def flush_sheet_changes():
+    """
+    Apply all queued sheet mutations with one API call per worksheet.
+    """
+    # Record the additions in the "added" sheet.
+    if added_rows:
+        CTX.worksheet("added").append_rows(added_rows)
+        CTX.sheet_index.record_added(added_rows)
+        REPORT.count("sheets", "writes")
 
-    # Clear processed rows from "to add" sheet (clear each row).
-    for row_idx in sorted(set(rows_to_clear), reverse=True):
-        to_add_sheet.batch_clear([f"{row_idx}:{row_idx}"])
+    # Clear processed rows from "to add" sheet (all rows in one request).
+    if rows_to_clear:
+        CTX.worksheet("to add").batch_clear([f"{row_idx}:{row_idx}" for row_idx in sorted(set(rows_to_clear))])
+        REPORT.count("sheets", "writes")
 
     # Write issues in "has issues" sheet.
     if issues:
-        for issue in issues:
-            has_issues_sheet.append_row(issue)
-
-    # Publish after everything is created
-    publish_items(ANIMES_COLLECTION_ID, animes_to_publish)
-    publish_items(ANIME_VIDEOS_COLLECTION_ID, anime_videos_to_publish)
+        CTX.worksheet("has issues").append_rows(issues)
+        REPORT.count("sheets", "writes")
 
 
 def create_animes_collection_items(title, playlist_id, thumb_url, idx):
     try:
-        yt = build('youtube', 'v3', developerKey=YT_API_KEY)
-        playlist = yt.playlists().list(
-            part='contentDetails,id,localizations,snippet,status',
-            id=playlist_id
-        ).execute()
-        playlist_videos = fetch_playlist_videos(yt, playlist_id)
+        yt = get_youtube(CTX.yt_api_key)
+        params = {
+            "part": 'contentDetails,id,localizations,snippet,status',
+            "id": playlist_id
+        }
+        playlist = CTX.yt_cache.execute("playlists", params, yt.playlists().list(**params), CTX.yt_limiter)
+        playlist_videos = fetch_playlist_videos(CTX, playlist_id)
         description = playlist['items'][0]['snippet'].get('description', '') if playlist.get('items') else ''
 
         # No need to include slug, Webflow will auto-generate it.
@@ -130,7 +187,7 @@ def create_animes_collection_items(title, playlist_id, thumb_url, idx):
             }
         }
 
-        response = safe_post(ANIMES_CREATE_COLLECTION_ITEMS_URL, WEBFLOW_API_HEADERS, data)
+        response = CTX.webflow.post(f"/collections/{ANIMES_COLLECTION_ID}/items", data)
         new_animes_collection_id = None
         if response.ok:
             resp_json = response.json()
@@ -149,188 +206,43 @@ def create_animes_collection_items(title, playlist_id, thumb_url, idx):
 
 
 def create_anime_videos_collection_items(item_id, playlist_videos, title, playlist_id, thumb_url):
-    video_data_list = []
-    parsed_videos = []
-
     # ----------------------------
-    # Gather and parse video info
+    # Create Webflow-ready items, numbered by publish date (then playlist position)
     # ----------------------------
-    for video in playlist_videos.get('items', []):
-        try:
-            snippet = video['snippet']
-            localized_snippet = snippet.get('localized', {})
-
-            video_id = video['id']
-            video_url = f"https://www.youtube.com/watch?v={video_id}"
-
-            localized_video_title = localized_snippet.get('title', snippet['title'])
-
-            playlist_position = video['playlistPosition']
-
-            published_at = snippet['publishedAt']
-
-            # Parse published date
-            dt = datetime.strptime(published_at, "%Y-%m-%dT%H:%M:%SZ")
-
-            parsed_videos.append({
-                "video_id": video_id,
-                "video_title": localized_video_title,
-                "video_url": video_url,
-                "published_at": dt,
-                "playlist_position": playlist_position,
-            })
-
-        except Exception as e:
-            issues.append([title, playlist_id, thumb_url, CURRENT_DATETIME,
-                           f"Error preparing video {video.get('id', 'unknown')}: {e}"])
-            continue
-
-    # Sort by published date ascending, if published date is same, use playlist position
-    parsed_videos.sort(key=lambda x: (x["published_at"], x["playlist_position"]))
-
-    if not parsed_videos:
-        return []
-
-    # ----------------------------
-    # Create Webflow-ready items with new episode order
-    # ----------------------------
-    for idx, v in enumerate(parsed_videos, start=1):
-        published_at_utc = v["published_at"].strftime("%Y-%m-%dT%H:%M:%SZ")
-
+    video_data_list = []
+    for idx, video in enumerate(episode_order(playlist_videos), start=1):
         video_data_list.append({
             "isArchived": False,
             "isDraft": False,
             "fieldData": {
-                "name": v["video_title"],
-                "youtube-video-id": v["video_id"],
-                "youtube-video": v["video_url"],
+                "name": video.title,
+                "youtube-video-id": video.video_id,
+                "youtube-video": f"https://www.youtube.com/watch?v={video.video_id}",
                 "anime-title-3": item_id,
                 "episode-order": idx,  # Now based on publish date
-                "youtube-video-publish-date": published_at_utc
+                "youtube-video-publish-date": video.published_at
             }
         })
 
+    if not video_data_list:
+        return []
+
     # ----------------------------
-    # Send them all at once to Webflow
+    # Send them to Webflow in bulk chunks
     # ----------------------------
-    url = f"https://api.webflow.com/v2/collections/{ANIME_VIDEOS_COLLECTION_ID}/items"
     try:
-        response = safe_post(url, WEBFLOW_API_HEADERS, {"items": video_data_list})
-        if response.ok:
-            resp_json = response.json()
-            new_ids = [item["id"] for item in resp_json.get("items", [])]
-            print(f"Created {len(new_ids)} videos for anime ({title}, playlist_id: {playlist_id})")
-            return new_ids
-        else:
-            print("Webflow error:", response.status_code, response.text)
-            response.raise_for_status()
-            return []
+        created, failed = CTX.webflow.bulk_create_items(ANIME_VIDEOS_COLLECTION_ID, video_data_list, ("youtube-video-id", "anime-title-3"))
     except Exception as e:
         issues.append([title, playlist_id, thumb_url, CURRENT_DATETIME, f"Bulk video creation failed: {e}"])
         return []
 
+    for video_data, reason in failed:
+        issues.append([title, playlist_id, thumb_url, CURRENT_DATETIME,
+                       f"Failed to create video {video_data['fieldData']['youtube-video-id']}: {reason}"])
 
-def fetch_playlist_videos(yt, playlist_id):
-    all_video_ids = []             # Store all video IDs
-    video_positions = {}           # Map videoId -> position
-    next_page_token = None
-
-    # ----------------------------
-    # Get all video IDs + positions
-    # ----------------------------
-    while True:
-        request = yt.playlistItems().list(
-            part="contentDetails,snippet",  # snippet is needed for position
-            playlistId=playlist_id,
-            maxResults=50,
-            pageToken=next_page_token
-        )
-        response = request.execute()
-
-        for item in response.get("items", []):
-            video_id = item["contentDetails"]["videoId"]
-            position = item["snippet"]["position"]
-            
-            all_video_ids.append(video_id)
-            video_positions[video_id] = position  # Save position
-
-        # Pagination handling
-        next_page_token = response.get("nextPageToken")
-        if not next_page_token:
-            break
-
-        # Add delay to avoid possible problems with the API.
-        time.sleep(0.5)  
-
-    # ----------------------------
-    # Fetch video details in batches of 50
-    # ----------------------------
-    all_videos = []
-    for i in range(0, len(all_video_ids), 50):
-        batch_ids = all_video_ids[i:i+50]
-
-        request = yt.videos().list(
-            part="snippet,contentDetails",
-            id=",".join(batch_ids),
-            hl="en"
-        )
-        response = request.execute()
-
-        for video in response.get("items", []):
-            snippet = video.get("snippet")
-
-            # Skip if no snippet or marked as private/deleted
-            if not snippet:
-                continue
-
-            title = snippet.get("title", "").lower()
-
-            if title in ("private video", "deleted video", ""):
-                continue
-
-            vid = video["id"]
-
-            # Merge position into video details
-            video["playlistPosition"] = video_positions.get(vid)
-            all_videos.append(video)
-
-        # Add delay to avoid possible problems with the API.
-        time.sleep(0.5)  
-
-    # Sort results by playlist position to guarantee correct order
-    all_videos.sort(key=lambda v: v.get("playlistPosition", float("inf")))
-
-    return {"items": all_videos}
-
-
-def safe_post(url, headers, json_data, retries=10):
-    """
-    Send a POST request safely with basic retry logic and rate-limit handling.
-    """
-    for attempt in range(retries):
-        response = requests.post(url, headers=headers, json=json_data)
-        if response.status_code == 429:  # rate limited
-            retry_after = int(response.headers.get("Retry-After", 5))
-            print(f"Rate limit hit, waiting {retry_after}s...")
-            time.sleep(retry_after)
-            continue
-        if response.ok:
-            return response
-        print(f"Error {response.status_code}: {response.text}")
-        time.sleep(1)
-    return response  # last response (could be error)
-
-
-def publish_items(collection_id, item_ids):
-    if not item_ids:
-        return
-    url = f"https://api.webflow.com/v2/collections/{collection_id}/items/publish"
-    response = safe_post(url, WEBFLOW_API_HEADERS, {"itemIds": item_ids})
-    if response.ok:
-        print(f"Published {len(item_ids)} items in collection {collection_id}")
-    else:
-        print("Webflow publish error:", response.status_code, response.text)
-        response.raise_for_status()
+    new_ids = [new_id for _, new_id in created]
+    print(f"Created {len(new_ids)} videos for anime ({title}, playlist_id: {playlist_id})")
+    return new_ids
 
 
 def main():
@@ -1,294 +1,535 @@
+import argparse
 import os
-import json
-import requests
 import time
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from datetime import datetime, timezone
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from anibridge.context import Context
+from anibridge.export import ShardWriter
+from anibridge.instrumentation import REPORT
+from anibridge.playlists import episode_order, fetch_playlist_videos
+from anibridge.schedule import plan_playlist_checks
+from anibridge.webflow import WEBFLOW_BULK_ITEM_LIMIT, PublishQueue, is_rejected
+from anibridge.webflow_mirror import WebflowMirror
 
-WEBFLOW_API_SITE_TOKEN = os.environ["WEBFLOW_API_SITE_TOKEN"]
 ANIMES_COLLECTION_ID = "67fffeccd6749ed6ce46961b"
 ANIME_VIDEOS_COLLECTION_ID = "67ffcb961b77a49b301d4a26"
-ANIMES_GET_COLLECTION_ITEMS_URL = f"https://api.webflow.com/v2/collections/{ANIMES_COLLECTION_ID}/items"
-ANIME_VIDEOS_CREATE_COLLECTION_ITEMS_URL = f"https://api.webflow.com/v2/collections/{ANIME_VIDEOS_COLLECTION_ID}/items"
-ANIME_VIDEOS_LIST_COLLECTION_ITEMS_URL = f"https://api.webflow.com/v2/collections/{ANIME_VIDEOS_COLLECTION_ID}/items"
 
-WEBFLOW_API_HEADERS = {
-    "Authorization": f"Bearer {WEBFLOW_API_SITE_TOKEN}",
-    "Content-Type": "application/json"
-}
+# Number of playlists fetched from YouTube in parallel.
+SYNC_WORKERS = int(os.environ.get("SYNC_WORKERS", "4"))
+
+# What to do with Webflow videos that are no longer in the playlist (removed, private or deleted):
+# "archive" them, "delete" them, or "keep" them live.
+SYNC_REMOVED_VIDEOS = os.environ.get("SYNC_REMOVED_VIDEOS", "archive").lower()
+
+# Directory of the per-anime episode lists (<anime slug>.json + manifest.json) served by
+# GitHub Pages. Set to an empty value to skip the export.
+EPISODES_EXPORT_DIR = os.environ.get("EPISODES_EXPORT_DIR", "episodes")
+
+# Resume an interrupted run: skip the animes it finished if it started less than this many
+# hours ago. Items it created but did not publish are always published. "0" disables skipping.
+SYNC_RESUME_MAX_AGE_HOURS = float(os.environ.get("SYNC_RESUME_MAX_AGE_HOURS", "6"))
+
+# Minimum seconds between saves of the playlist state during a run (it is always saved at the end).
+CHECKPOINT_SAVE_SECONDS = 60
+
+# An Anime Videos item as kept in the index (Webflow item id + the fields the diff and the
+# episode export use).
+IndexedVideo = namedtuple("IndexedVideo", "item_id episode_order name is_archived published_at")
+
+# Changes for the Anime Videos collection: items to create, item updates and item ids to remove.
+AnimeVideosDiff = namedtuple("AnimeVideosDiff", "create update remove")
 
-CREDS_JSON = os.environ['GOOGLE_SERVICE_ACCOUNT_JSON']
-CREDS_DICT = json.loads(CREDS_JSON)
-CREDS = Credentials.from_service_account_info(CREDS_DICT, scopes=["https://www.googleapis.com/auth/spreadsheets"])
-YT_API_KEY = os.environ['YOUTUBE_API_KEY']
+# Secrets, clients, the YouTube cache and the playlist state are only loaded when first used.
+CTX = Context()
 
 
 def sync_anime_videos():
-    # Fetch all existing animes in Webflow.
-    all_existing_animes = fetch_all_animes()
-    print(f"all_existing_animes: {len(all_existing_animes)} total")
+    REPORT.start("sync_anime_videos")
 
-    # Fetch all existing videos in Webflow for this anime.
-    all_existing_anime_videos = fetch_all_anime_videos()
-    print(f"all_existing_anime_videos: {len(all_existing_anime_videos)} total")
+    # Pick up where an interrupted run stopped. Its unpublished items are published first.
+    journal = CTX.sync_journal
+    done_animes, orphaned_ids = journal.start(SYNC_RESUME_MAX_AGE_HOURS * 3600 or None)
 
-    # Group existing videos by anime.
-    videos_by_anime = {}
-    for item in all_existing_anime_videos:
-        anime_id = item['fieldData'].get('anime-title-3')
-        videos_by_anime.setdefault(anime_id, []).append(item)
+    # New and updated items go live in chunks as soon as they are created.
+    publisher = PublishQueue(
+        CTX.webflow, ANIME_VIDEOS_COLLECTION_ID,
+        on_published=lambda item_ids: journal.record("published", ids=item_ids),
+    )
+    if orphaned_ids:
+        print(f"Publishing {len(orphaned_ids)} items left unpublished by the previous run")
+        publisher.add(orphaned_ids)
+        publisher.flush()
 
-    anime_videos_to_publish = []  # collect all new items to publish
+    # Fetch all existing animes in Webflow.
+    with REPORT.span("fetch_animes"):
+        all_existing_animes = fetch_all_animes()
+    REPORT.items("animes", len(all_existing_animes))
+    print(f"all_existing_animes: {len(all_existing_animes)} total")
 
-    for anime in all_existing_animes:
-        playlist_id = anime['fieldData'].get('youtube-playlist-id')
+    # Index existing videos in Webflow by anime, streaming the collection page by page.
+    with REPORT.span("index_anime_videos"):
+        videos_by_anime, anime_videos_total = index_anime_videos()
+    REPORT.items("anime_videos_indexed", anime_videos_total)
+    print(f"all_existing_anime_videos: {anime_videos_total} total")
 
-        if not playlist_id:
-            continue
+    pending = AnimeVideosDiff([], [], [])  # changes waiting for the next bulk request
+    pending_animes = []                    # animes with changes in `pending`
+    last_state_save = time.monotonic()
+    episodes = ShardWriter(EPISODES_EXPORT_DIR) if EPISODES_EXPORT_DIR else None
 
-        # ----------------------------
-        # Fetch all YouTube videos.
-        # ----------------------------
-        yt_videos = fetch_playlist_videos(playlist_id)
-        yt_items = yt_videos.get('items')
-        if not yt_items:
+    animes_with_playlist = []
+    skipped = 0
+    for anime in all_existing_animes:
+        if not anime['fieldData'].get('youtube-playlist-id'):
             continue
-
-        # ----------------------------
-        # Sort by publish date ascending, if published date is same, use playlist position
-        # ----------------------------
-        try:
-            yt_items.sort(key=lambda v: (
-                datetime.strptime(v['snippet']['publishedAt'], "%Y-%m-%dT%H:%M:%SZ"), 
-                v['playlistPosition'])       
-            )
-        except Exception as e:
-            print(f"Failed to sort videos for playlist {playlist_id}: {e}")
+        if anime['id'] in done_animes:
+            # Finished by the interrupted run, so Webflow already has its videos.
+            if episodes:
+                episodes.add(episodes_key(anime), anime_episodes(None, videos_by_anime.get(anime['id'], {})))
+            skipped += 1
             continue
+        animes_with_playlist.append(anime)
 
-        # Get existing video IDs for this anime to avoid duplicates
-        existing_videos = videos_by_anime.get(anime['id'], [])
-        existing_video_ids = {v['fieldData']['youtube-video-id'] for v in existing_videos}
-
-        ### This is not needed because the loop will start from the first video 
-        ### and increment the episode number based on the order in the playlist.
-        # Find the current highest episode number (default to 0 if none)
-        # max_existing_order = 0
-        # for v in existing_videos:
-        #     try:
-        #         order = int(v['fieldData'].get('episode-order', 0))
-        #         if order > max_existing_order:
-        #             max_existing_order = order
-        #     except (TypeError, ValueError):
-        #         continue
-        # next_episode_number = max_existing_order + 1
-
-        # ----------------------------
-        # Loop through sorted videos and assign new episode order
-        # ----------------------------
-        for episode_number, video in enumerate(yt_items, start=1):
-            video_id = video['id']
-            if video_id in existing_video_ids:
-                continue  # skip duplicates
-
-            snippet = video['snippet']
-            localized_snippet = snippet.get('localized', {})
-            
-            localized_video_title = localized_snippet.get('title', snippet['title'])
-
-            print(f"{localized_video_title}: Not existing video_id: {video_id}")
-
-            video_data = {
-                "isArchived": False,
-                "isDraft": False,
-                "fieldData": {
-                    "name": localized_video_title,
-                    "youtube-video-id": video_id,
-                    "youtube-video": f"https://www.youtube.com/watch?v={video_id}",
-                    "anime-title-3": anime['id'],
-                    "episode-order": episode_number,  # ordered by publish date
-                    "youtube-video-publish-date": video['snippet']['publishedAt']
-                }
-            }
+    if skipped:
+        print(f"Resuming: skipping {skipped} animes finished by the previous run")
 
-            # Add to Webflow
-            anime_video_id = add_anime_videos_collection_item(video_data)
-            if anime_video_id:
-                anime_videos_to_publish.append(anime_video_id)
+    # ----------------------------
+    # Only check the playlists that are due, within the YouTube quota budget.
+    # The others keep their current Webflow items.
+    # ----------------------------
+    plan = plan_sync(animes_with_playlist, videos_by_anime)
+    if episodes:
+        for check in plan.deferred + plan.not_due:
+            episodes.add(episodes_key(check.anime), anime_episodes(None, videos_by_anime.get(check.anime['id'], {})))
+    animes_with_playlist = [check.anime for check in plan.check]
 
     # ----------------------------
-    # Batch publish all new items
+    # Fetch all YouTube videos.
+    # Playlists are fetched in parallel, but results are consumed in the
+    # same order as the animes so the output stays deterministic.
+    # The "sync_playlists" span includes the bulk requests made while playlists
+    # are still being fetched; those are also timed on their own.
     # ----------------------------
-    if anime_videos_to_publish:
-        publish_anime_videos(anime_videos_to_publish)
+    with REPORT.span("sync_playlists"), ThreadPoolExecutor(max_workers=SYNC_WORKERS) as executor:
+        playlist_ids = [a['fieldData']['youtube-playlist-id'] for a in animes_with_playlist]
+        fetched_playlists = executor.map(
+            lambda playlist_id: fetch_playlist_videos(CTX, playlist_id, CTX.playlist_state), playlist_ids,
+        )
+
+        for anime, yt_videos in zip(animes_with_playlist, fetched_playlists):
+            yt_items = sort_playlist_videos(yt_videos)
+            existing_videos = videos_by_anime.get(anime['id'], {})
+
+            diff = diff_anime_videos(anime, yt_items, existing_videos)
+            REPORT.items("playlists_synced")
+
+            if episodes:
+                episodes.add(episodes_key(anime), anime_episodes(yt_items, existing_videos))
+
+            # Apply the pending changes while the remaining playlists are still being fetched:
+            # first when this anime's changes would overflow a bulk request, then once one is full.
+            if any(len(changes) + len(new_changes) > WEBFLOW_BULK_ITEM_LIMIT for changes, new_changes in zip(pending, diff)):
+                publisher.add(checkpoint(journal, pending, pending_animes, flush=True))
 
+            for changes, new_changes in zip(pending, diff):
+                changes.extend(new_changes)
+            pending_animes.append(anime['id'])
+            publisher.add(checkpoint(journal, pending, pending_animes))
 
-def fetch_playlist_videos(playlist_id):
-    yt = build('youtube', 'v3', developerKey=YT_API_KEY)
-    all_video_ids = []             # Store all video IDs
-    video_positions = {}           # Map videoId -> position
-    next_page_token = None
+            if time.monotonic() - last_state_save >= CHECKPOINT_SAVE_SECONDS:
+                CTX.playlist_state.save()
+                last_state_save = time.monotonic()
+
+    publisher.add(checkpoint(journal, pending, pending_animes, flush=True))
 
     # ----------------------------
-    # Get all video IDs + positions
+    # Publish the last partial chunk
     # ----------------------------
-    while True:
-        request = yt.playlistItems().list(
-            part='snippet,contentDetails',
-            playlistId=playlist_id,
-            maxResults=50,
-            pageToken=next_page_token
+    publisher.flush()
+
+    if episodes:
+        written, removed = episodes.finish()
+        REPORT.items("episode_files_written", len(written))
+        print(f"Episode lists: {len(written)} files written, {len(removed)} removed")
+
+    CTX.playlist_state.save()
+
+    # Items that failed to publish are published again by the next run, unless Webflow
+    # rejected them for good (e.g. they were deleted in the meantime).
+    journal.finish([item_id for item_id, reason in publisher.failed if not is_rejected(reason)])
+    REPORT.emit()
+
+
+def plan_sync(animes, videos_by_anime):
+    """
+    Plan which playlists to check this run (see plan_playlist_checks) and report the plan.
+    """
+    plan = plan_playlist_checks(
+        (
+            anime,
+            CTX.playlist_state.get(anime['fieldData']['youtube-playlist-id']),
+            [v.published_at for v in videos_by_anime.get(anime['id'], {}).values()],
         )
-        response = request.execute()
+        for anime in animes
+    )
+
+    tiers = {}
+    for check in plan.check:
+        tiers[check.tier] = tiers.get(check.tier, 0) + 1
+    REPORT.items("playlists_planned", len(plan.check))
+    REPORT.items("playlists_deferred", len(plan.deferred))
+    REPORT.items("playlists_not_due", len(plan.not_due))
+    REPORT.count("youtube", "planned_quota_units", sum(check.cost for check in plan.check))
+
+    print(
+        f"Plan: checking {len(plan.check)} playlists "
+        f"({', '.join(f'{count} {tier}' for tier, count in sorted(tiers.items())) or 'none'}, "
+        f"~{sum(check.cost for check in plan.check)} quota units), "
+        f"{len(plan.deferred)} due but over the quota budget, {len(plan.not_due)} not due"
+    )
+    return plan
+
 
-        for item in response.get("items", []):
-            video_id = item["contentDetails"]["videoId"]
-            position = item["snippet"]["position"]
-            
-            all_video_ids.append(video_id)
-            video_positions[video_id] = position  # Save position
+def sync_anime(playlist_id=None, anime_id=None):
+    """
+    Sync the videos of one anime, found by its YouTube playlist id and/or Animes item id,
+    with the same diff, bulk requests and publishing as the full sync. The playlist is read
+    from YouTube even if a cached copy exists. Returns the AnimeVideosDiff that was applied,
+    or None when there is no such anime with a playlist.
+    """
+    REPORT.start("sync_anime")
+
+    with REPORT.span("find_anime"):
+        animes = find_items(ANIMES_COLLECTION_ID, item_id=anime_id, playlist_id=playlist_id)
+    anime = next((a for a in animes if a['fieldData'].get('youtube-playlist-id')), None)
+    if anime is None:
+        print(f"No anime with a playlist found (playlist_id: {playlist_id}, anime_id: {anime_id})")
+        REPORT.emit()
+        return None
+
+    playlist_id = anime['fieldData']['youtube-playlist-id']
+    print(f"Syncing {anime['fieldData'].get('name')} (playlist_id: {playlist_id})")
+
+    with REPORT.span("index_anime_videos"):
+        existing_videos = {}
+        for item in find_items(ANIME_VIDEOS_COLLECTION_ID, anime_id=anime['id']):
+            index_video(existing_videos, item)
+
+    with REPORT.span("sync_playlists"):
+        yt_items = sort_playlist_videos(fetch_playlist_videos(CTX, playlist_id, CTX.playlist_state, fresh=True))
+        diff = diff_anime_videos(anime, yt_items, existing_videos)
+    REPORT.items("playlists_synced")
+    applied = AnimeVideosDiff(*(list(changes) for changes in diff))
 
-        # Pagination handling
-        next_page_token = response.get("nextPageToken")
-        if not next_page_token:
-            break
+    publisher = PublishQueue(CTX.webflow, ANIME_VIDEOS_COLLECTION_ID)
+    publisher.add(apply_anime_videos_diff(diff, flush=True))
+    publisher.flush()
 
-        # Add delay to avoid possible problems with the API.
-        time.sleep(0.5)  
+    if EPISODES_EXPORT_DIR:
+        episodes = ShardWriter(EPISODES_EXPORT_DIR, keep_existing=True)
+        episodes.add(episodes_key(anime), anime_episodes(yt_items, existing_videos))
+        episodes.finish()
+
+    CTX.playlist_state.save()
+    REPORT.emit()
+    return applied
+
+
+def find_items(collection_id, **fields):
+    """
+    Return the items of a collection matching `fields` (see WebflowMirror.find_items). The
+    mirror is refreshed first, so it includes what earlier syncs in this process wrote;
+    without a mirror, the whole collection is listed.
+    """
+    source = CTX.webflow_items
+    if isinstance(source, WebflowMirror):
+        source.refresh(collection_id)
+        return source.find_items(collection_id, **fields)
+
+    def lookup_values(item):
+        field_data = item['fieldData']
+        return {
+            "item_id": item['id'],
+            "playlist_id": field_data.get('youtube-playlist-id'),
+            "video_id": field_data.get('youtube-video-id'),
+            "anime_id": field_data.get('anime-title-3'),
+        }
+
+    return [
+        item for item in source.fetch_all_items(collection_id)
+        if all(lookup_values(item)[name] == value for name, value in fields.items() if value is not None)
+    ]
+
+
+def checkpoint(journal, pending, pending_animes, flush=False):
+    """
+    Apply the pending changes once a bulk request is full (or when `flush` is set) and
+    record the progress in the journal: the created/updated item ids to publish, and the
+    animes whose changes are now all in Webflow. Returns the item ids to publish.
+    """
+    item_ids = apply_anime_videos_diff(pending, flush)
+    if item_ids:
+        journal.record("created", ids=item_ids)
+
+    if pending_animes and not any(pending):
+        journal.record("done", ids=pending_animes[:])
+        pending_animes.clear()
+    return item_ids
+
+
+def sort_playlist_videos(yt_videos):
+    """
+    Return the playlist's VideoRecords in episode order, or None when the playlist came
+    back empty (so it must not be treated as "every video was removed").
+    """
+    if not yt_videos:
+        return None
+    return episode_order(yt_videos)
+
+
+def diff_anime_videos(anime, yt_items, existing_videos):
+    """
+    Compare the playlist's VideoRecords in episode order (see sort_playlist_videos) with the
+    anime's videos in Webflow (`existing_videos`: YouTube video id -> IndexedVideo) and
+    return an AnimeVideosDiff:
+
+    - create: Webflow items for videos that are not in Webflow yet.
+    - update: item updates for videos whose episode order or title changed, or that were
+      archived and are back in the playlist.
+    - remove: item ids of videos that are no longer in the playlist.
+    """
+    diff = AnimeVideosDiff([], [], [])
+    if not yt_items:
+        return diff
 
     # ----------------------------
-    # Fetch video details in batches of 50
+    # Loop through sorted videos and assign episode order
     # ----------------------------
-    all_videos = []
-    for i in range(0, len(all_video_ids), 50):
-        batch_ids = all_video_ids[i:i+50]
-
-        request = yt.videos().list(
-            part="snippet,contentDetails",
-            id=",".join(batch_ids),
-            hl="en"
-        )
-        response = request.execute()
+    playlist_video_ids = set()
+    for episode_number, video in enumerate(yt_items, start=1):
+        video_id = video.video_id
+        playlist_video_ids.add(video_id)
+
+        localized_video_title = video.title
+
+        existing = existing_videos.get(video_id)
+        if existing:
+            changes = {}
+            if existing.episode_order != episode_number:
+                changes["episode-order"] = episode_number
+            if existing.name != localized_video_title:
+                changes["name"] = localized_video_title
+
+            if changes or existing.is_archived:
+                print(f"{localized_video_title}: Updating video_id: {video_id} {changes}")
+                diff.update.append({"id": existing.item_id, "isArchived": False, "fieldData": changes})
+            continue
 
-        for video in response.get("items", []):
-            snippet = video["snippet"]
-            localized_snippet = snippet.get('localized', {})
+        print(f"{localized_video_title}: Not existing video_id: {video_id}")
+
+        video_data = {
+            "isArchived": False,
+            "isDraft": False,
+            "fieldData": {
+                "name": localized_video_title,
+                "youtube-video-id": video_id,
+                "youtube-video": f"https://www.youtube.com/watch?v={video_id}",
+                "anime-title-3": anime['id'],
+                "episode-order": episode_number,  # ordered by publish date
+                "youtube-video-publish-date": video.published_at
+            }
+        }
 
-            # Skip if no snippet or marked as private/deleted
-            if not snippet:
-                continue
+        diff.create.append(video_data)
 
-            localized_video_title = localized_snippet.get('title', snippet['title']).lower()
+    # ----------------------------
+    # Videos no longer in the playlist (removed, private or deleted)
+    # ----------------------------
+    for video_id, existing in existing_videos.items():
+        if video_id not in playlist_video_ids and not existing.is_archived:
+            print(f"{existing.name}: Removed from playlist video_id: {video_id}")
+            diff.remove.append(existing.item_id)
 
-            if localized_video_title in ("private video", "deleted video", ""):
-                continue
+    return diff
 
-            vid = video["id"]
 
-            # Merge position into video details
-            video["playlistPosition"] = video_positions.get(vid)
-            all_videos.append(video)
+def episodes_key(anime):
+    return anime['fieldData'].get('slug') or anime['id']
 
-        # Add delay to avoid possible problems with the API.
-        time.sleep(0.5)  
 
-    # Sort results by playlist position to guarantee correct order
-    all_videos.sort(key=lambda v: v.get("playlistPosition", float("inf")))
-        
-    return {"items": all_videos}
+def anime_episodes(yt_items, existing_videos):
+    """
+    Return the anime's episode list for the static export: the playlist in episode order,
+    or the live Webflow items when the playlist could not be read.
+    """
+    if yt_items:
+        return [
+            {
+                "videoId": video.video_id,
+                "title": video.title,
+                "episodeOrder": episode_number,
+                "publishedAt": video.published_at,
+            }
+            for episode_number, video in enumerate(yt_items, start=1)
+        ]
 
+    live = sorted(
+        ((video_id, v) for video_id, v in existing_videos.items() if not v.is_archived),
+        key=lambda pair: (pair[1].episode_order is None, pair[1].episode_order or 0, pair[0]),
+    )
+    return [
+        {"videoId": video_id, "title": v.name, "episodeOrder": v.episode_order, "publishedAt": v.published_at}
+        for video_id, v in live
+    ]
 
-def fetch_all_animes():
-    return fetch_all_items(ANIMES_GET_COLLECTION_ITEMS_URL, WEBFLOW_API_HEADERS)
 
+def apply_anime_videos_diff(pending, flush=False):
+    """
+    Send the pending changes to Webflow in bulk requests and return the ids of the created
+    and updated items (to publish). Unless `flush` is set, nothing is sent until one of the
+    lists fills a whole bulk request; then all of them are sent, so every anime with pending
+    changes is complete afterwards.
+    """
+    if not (flush or any(len(changes) >= WEBFLOW_BULK_ITEM_LIMIT for changes in pending)):
+        return []
 
-def fetch_all_anime_videos():
-    return fetch_all_items(ANIME_VIDEOS_LIST_COLLECTION_ITEMS_URL, WEBFLOW_API_HEADERS)
+    item_ids = []
+    if pending.create:
+        item_ids.extend(create_anime_videos(pending.create))
+        pending.create.clear()
 
+    if pending.update:
+        item_ids.extend(update_anime_videos(pending.update))
+        pending.update.clear()
 
-def fetch_all_items(collection_url, headers):
-    all_items = []
-    offset = 0
-    limit = 100  # Webflow API's max limit per request.
+    if pending.remove:
+        remove_anime_videos(pending.remove)
+        pending.remove.clear()
 
-    while True:
-        response = requests.get(
-            f"{collection_url}?offset={offset}&limit={limit}",
-            headers=headers
-        )
+    return item_ids
 
-        # Handle rate limit
-        if response.status_code == 429:
-            retry_after = int(response.headers.get("Retry-After", 5))
-            print(f"Rate limit hit, retrying after {retry_after}s...")
-            time.sleep(retry_after)
-            continue  # retry the same request
 
-        if not response.ok:
-            print("Error fetching items:", response.status_code, response.text)
-            break
+def create_anime_videos(videos_to_create):
+    if not videos_to_create:
+        return []
 
-        data = response.json()
-        items = data.get("items", [])
-        if not items:
-            break  # no more items
+    with REPORT.span("create_videos"):
+        created, failed = CTX.webflow.bulk_create_items(ANIME_VIDEOS_COLLECTION_ID, videos_to_create, ("youtube-video-id", "anime-title-3"))
+    REPORT.items("videos_created", len(created))
 
-        all_items.extend(items)
+    for video_data, reason in failed:
+        field_data = video_data['fieldData']
+        print(f"Error adding video {field_data['youtube-video-id']} (anime {field_data['anime-title-3']}): {reason}")
 
-        # If returned less than the limit, we've reached the last page
-        if len(items) < limit:
-            break
+    print(f"Created {len(created)} of {len(videos_to_create)} videos")
+    return [new_id for _, new_id in created]
 
-        offset += limit
-        time.sleep(1)  # stay under 60 req/min
 
-    return all_items
+def update_anime_videos(video_updates):
+    with REPORT.span("update_videos"):
+        updated, failed = CTX.webflow.bulk_update_items(ANIME_VIDEOS_COLLECTION_ID, video_updates)
+    REPORT.items("videos_updated", len(updated))
 
+    for update, reason in failed:
+        print(f"Error updating video item {update['id']}: {reason}")
 
-def add_anime_videos_collection_item(video_data):
-    response = safe_post(ANIME_VIDEOS_CREATE_COLLECTION_ITEMS_URL, WEBFLOW_API_HEADERS, video_data)
-    if not response.ok:
-        print("Error adding video to collection:", response.status_code, response.text)
-        return None
+    updated_ids = set(updated)
+    mirror_updates([update for update in video_updates if update['id'] in updated_ids])
+    print(f"Updated {len(updated)} of {len(video_updates)} videos")
+    return updated
+
+
+def remove_anime_videos(item_ids):
+    if SYNC_REMOVED_VIDEOS not in ("archive", "delete"):
+        print(f"Keeping {len(item_ids)} videos that are no longer in their playlist")
+        return
+
+    with REPORT.span("remove_videos"):
+        # Take them off the live site first; archiving or deleting only changes the staged items.
+        _, unpublish_failed = CTX.webflow.bulk_delete_items(ANIME_VIDEOS_COLLECTION_ID, item_ids, live=True)
+        if SYNC_REMOVED_VIDEOS == "delete":
+            removed, failed = CTX.webflow.bulk_delete_items(ANIME_VIDEOS_COLLECTION_ID, item_ids)
+            if isinstance(CTX.webflow_items, WebflowMirror):
+                CTX.webflow_items.remove_items(ANIME_VIDEOS_COLLECTION_ID, removed)
+        else:
+            updates = [{"id": item_id, "isArchived": True} for item_id in item_ids]
+            removed, failed = CTX.webflow.bulk_update_items(ANIME_VIDEOS_COLLECTION_ID, updates)
+            failed = [(update["id"], reason) for update, reason in failed]
+            mirror_updates([{"id": item_id, "isArchived": True} for item_id in removed])
+    REPORT.items("videos_removed", len(removed))
+
+    for item_id, reason in unpublish_failed:
+        # Items that were never published cannot be unpublished, which is fine.
+        print(f"Could not unpublish video item {item_id}: {reason}")
+    for item_id, reason in failed:
+        print(f"Error removing video item {item_id}: {reason}")
+
+    action = "Deleted" if SYNC_REMOVED_VIDEOS == "delete" else "Archived"
+    print(f"{action} {len(removed)} of {len(item_ids)} videos that are no longer in their playlist")
 
-    new_item = response.json()
-    return new_item.get("id")
 
+def mirror_updates(updates):
+    # Archiving and unpublished edits are not seen by the mirror's delta refresh.
+    if isinstance(CTX.webflow_items, WebflowMirror):
+        CTX.webflow_items.apply_updates(ANIME_VIDEOS_COLLECTION_ID, updates)
 
-def safe_post(url, headers, json_data, retries=10):
+
+def fetch_all_animes():
+    return CTX.webflow_items.fetch_all_items(ANIMES_COLLECTION_ID)
+
+
+def index_anime_videos():
     """
-    Send a POST request safely with basic retry logic and rate-limit handling.
+    Stream the Anime Videos collection and keep only a compact index of it:
+    anime item id -> {YouTube video id: IndexedVideo}. Returns the index and the item count.
     """
-    for attempt in range(retries):
-        response = requests.post(url, headers=headers, json=json_data)
-        if response.status_code == 429:  # rate limited
-            retry_after = int(response.headers.get("Retry-After", 5))
-            print(f"Rate limit hit, waiting {retry_after}s...")
-            time.sleep(retry_after)
-            continue
-        if response.ok:
-            return response
-        print(f"Error {response.status_code}: {response.text}")
-        time.sleep(1)
-    return response  # last response (could be error)
-
-
-def publish_anime_videos(item_ids):
-    url = f"https://api.webflow.com/v2/collections/{ANIME_VIDEOS_COLLECTION_ID}/items/publish"
-    response = requests.post(
-        url,
-        headers=WEBFLOW_API_HEADERS,
-        json={"itemIds": item_ids}
+    videos_by_anime = {}
+    total = 0
+    for page in CTX.webflow_items.iter_item_pages(ANIME_VIDEOS_COLLECTION_ID):
+        for item in page:
+            index_video(videos_by_anime.setdefault(item['fieldData'].get('anime-title-3'), {}), item)
+        total += len(page)
+    return videos_by_anime, total
+
+
+def index_video(videos, item):
+    """
+    Add an Anime Videos item to an anime's index (YouTube video id -> IndexedVideo).
+    """
+    field_data = item['fieldData']
+    video_id = field_data.get('youtube-video-id')
+    indexed = IndexedVideo(
+        item['id'], _int_or_none(field_data.get('episode-order')), field_data.get('name'),
+        item.get('isArchived', False), field_data.get('youtube-video-publish-date'),
     )
-    if not response.ok:
-        print("Error publishing items:", response.status_code, response.text)
-    else:
-        print(f"Published {len(item_ids)} items.")
+    # Pages arrive out of order, so resolve duplicate items for a video deterministically.
+    if video_id not in videos or _index_preference(indexed) < _index_preference(videos[video_id]):
+        videos[video_id] = indexed
+
+
+def _index_preference(indexed):
+    # Prefer the live item, then the oldest (smallest) id.
+    return indexed.is_archived, indexed.item_id
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
 
 
 def main():
-    sync_anime_videos()
+    parser = argparse.ArgumentParser(description="Sync the Anime Videos collection with the YouTube playlists.")
+    parser.add_argument("--playlist-id", help="only sync the anime with this YouTube playlist id")
+    parser.add_argument("--anime-id", help="only sync the anime with this Animes item id")
+    args = parser.parse_args()
+
+    if args.playlist_id or args.anime_id:
+        sync_anime(playlist_id=args.playlist_id, anime_id=args.anime_id)
+    else:
+        sync_anime_videos()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,206 @@
+import argparse
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.etree import ElementTree
+
+from anibridge.schedule import classify_playlist
+from anibridge.sync_queue import SyncQueue
+from sync_anime_videos import ANIMES_COLLECTION_ID, CTX, sync_anime
+
+# Address the receiver listens on. Put it behind a reverse proxy / tunnel to receive webhooks.
+SYNC_RECEIVER_HOST = os.environ.get("SYNC_RECEIVER_HOST", "127.0.0.1")
+SYNC_RECEIVER_PORT = int(os.environ.get("SYNC_RECEIVER_PORT", "8080"))
+
+# Seconds between the first notification about an anime and its sync; later notifications
+# about the same anime in that time are merged into the same sync.
+SYNC_RECEIVER_DELAY_SECONDS = float(os.environ.get("SYNC_RECEIVER_DELAY_SECONDS", "30"))
+
+# Secrets used to sign the notifications. When unset, signatures are not checked, which is
+# only allowed when the receiver listens on a loopback address (see main()).
+WEBFLOW_WEBHOOK_SECRET = os.environ.get("WEBFLOW_WEBHOOK_SECRET")
+YOUTUBE_HUB_SECRET = os.environ.get("YOUTUBE_HUB_SECRET")
+
+# Webflow webhooks older than this are rejected (replay protection).
+WEBFLOW_WEBHOOK_MAX_AGE_SECONDS = 300
+
+# Webflow trigger types that can add an anime or change its playlist.
+WEBFLOW_SYNC_TRIGGERS = ("collection_item_created", "collection_item_changed")
+
+ATOM_NS = {
+    "atom": "http://www.w3.org/2005/Atom",
+    "yt": "http://www.youtube.com/xml/schemas/2015",
+    "at": "http://purl.org/atompub/tombstones/1.0",
+}
+
+
+# ----------------------------
+# Notifications -> targeted syncs
+# ----------------------------
+def queue_webflow_event(queue, event):
+    """
+    Queue a sync for an Animes item created or changed in Webflow. Returns the number of
+    syncs queued. Events for other collections (e.g. the Anime Videos items the syncs
+    themselves write) are ignored.
+    """
+    payload = event.get("payload") or {}
+    if event.get("triggerType") not in WEBFLOW_SYNC_TRIGGERS or payload.get("collectionId") != ANIMES_COLLECTION_ID:
+        return 0
+
+    playlist_id = (payload.get("fieldData") or {}).get("youtube-playlist-id")
+    if not playlist_id:
+        return 0
+    return int(queue.put(playlist_id, anime_id=payload["id"]))
+
+
+def queue_youtube_feed(queue, body):
+    """
+    Queue syncs for a YouTube push notification (an Atom feed of new, updated or deleted
+    videos of a channel). Playlists are matched from the playlist state, so only playlists
+    the sync has seen before are matched: the playlists that already contain the video, and
+    the channel's currently airing ("hot", see classify_playlist) playlists, since one
+    channel can own hundreds of anime playlists. Returns the number of syncs queued.
+    """
+    feed = ElementTree.fromstring(body)
+    state = CTX.playlist_state
+    now = time.time()
+    playlist_ids = []
+    for entry in feed.findall("atom:entry", ATOM_NS):
+        playlist_ids += state.find_playlists(video_id=entry.findtext("yt:videoId", namespaces=ATOM_NS))
+        playlist_ids += [
+            playlist_id
+            for playlist_id in state.find_playlists(channel_id=entry.findtext("yt:channelId", namespaces=ATOM_NS))
+            if classify_playlist(None, state.get(playlist_id), [], now)[0] == "hot"
+        ]
+    for deleted in feed.findall("at:deleted-entry", ATOM_NS):
+        video_id = deleted.get("ref", "").rsplit(":", 1)[-1]
+        playlist_ids += state.find_playlists(video_id=video_id)
+
+    return sum(queue.put(playlist_id, playlist_id=playlist_id) for playlist_id in dict.fromkeys(playlist_ids))
+
+
+def valid_webflow_signature(headers, body):
+    if not WEBFLOW_WEBHOOK_SECRET:
+        return True
+    timestamp = headers.get("x-webflow-timestamp", "")
+    try:
+        if abs(time.time() * 1000 - int(timestamp)) > WEBFLOW_WEBHOOK_MAX_AGE_SECONDS * 1000:
+            return False
+    except ValueError:
+        return False
+    expected = hmac.new(WEBFLOW_WEBHOOK_SECRET.encode(), f"{timestamp}:".encode() + body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, headers.get("x-webflow-signature", ""))
+
+
+def valid_hub_signature(headers, body):
+    if not YOUTUBE_HUB_SECRET:
+        return True
+    expected = "sha1=" + hmac.new(YOUTUBE_HUB_SECRET.encode(), body, hashlib.sha1).hexdigest()
+    return hmac.compare_digest(expected, headers.get("X-Hub-Signature", ""))
+
+
+# ----------------------------
+# HTTP server
+# ----------------------------
+def make_server(queue, host=SYNC_RECEIVER_HOST, port=SYNC_RECEIVER_PORT):
+    """
+    Return an HTTP server with these endpoints:
+
+    - POST /webflow: Webflow `collection_item_*` webhooks.
+    - GET /youtube: PubSubHubbub subscription verification (echoes `hub.challenge`).
+    - POST /youtube: PubSubHubbub notifications of a channel's videos.
+    - GET /status: queue counters, as JSON.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/youtube":
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                if query.get("hub.mode") in ("subscribe", "unsubscribe") and "hub.challenge" in query:
+                    print(f"YouTube hub: {query['hub.mode']} {query.get('hub.topic')}")
+                    self._reply(200, query["hub.challenge"].encode(), "text/plain")
+                else:
+                    self._reply(400, b"")
+            elif url.path == "/status":
+                with queue.cond:
+                    status = {**queue.stats, "pending": len(queue.pending), "running": queue.running}
+                self._reply(200, json.dumps(status).encode())
+            else:
+                self._reply(404, b"")
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            path = urlparse(self.path).path
+            try:
+                if path == "/webflow":
+                    if not valid_webflow_signature(self.headers, body):
+                        self._reply(401, b"")
+                        return
+                    queued = queue_webflow_event(queue, json.loads(body))
+                elif path == "/youtube":
+                    # The hub only needs a 2xx; notifications with a bad signature are ignored.
+                    queued = queue_youtube_feed(queue, body) if valid_hub_signature(self.headers, body) else 0
+                else:
+                    self._reply(404, b"")
+                    return
+            except (ValueError, KeyError, ElementTree.ParseError) as e:
+                print(f"Ignoring malformed notification on {path}: {e}")
+                self._reply(400, b"")
+                return
+            self._reply(202, json.dumps({"queued": queued}).encode())
+
+        def _reply(self, status, data, content_type="application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Receive Webflow and YouTube notifications and sync the animes they are about.")
+    parser.add_argument("--host", default=SYNC_RECEIVER_HOST)
+    parser.add_argument("--port", type=int, default=SYNC_RECEIVER_PORT)
+    args = parser.parse_args()
+
+    # Without both secrets anyone who can reach the receiver could trigger syncs that spend quota.
+    if not (WEBFLOW_WEBHOOK_SECRET and YOUTUBE_HUB_SECRET):
+        if not is_loopback(args.host):
+            parser.error(f"--host {args.host} is not a loopback address: set WEBFLOW_WEBHOOK_SECRET and YOUTUBE_HUB_SECRET")
+        print("WARNING: WEBFLOW_WEBHOOK_SECRET and/or YOUTUBE_HUB_SECRET is not set, so notification "
+              "signatures are not checked. Set both before exposing the receiver through a proxy or tunnel.")
+
+    queue = SyncQueue(sync_anime, delay=SYNC_RECEIVER_DELAY_SECONDS).start()
+    server = make_server(queue, args.host, args.port)
+    print(f"Listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        queue.stop()
+
+
+if __name__ == "__main__":
+    main()